@@ -2,30 +2,243 @@
 Topic Discovery Hub - Configuration
 """
 
+import functools
 import json
 import os
+import re
+from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
 from dotenv import load_dotenv
 
-env_path = Path(__file__).parent / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson opcjonalny - fallback na stdlib
+    _json_loads = json.loads
+
+try:
+    import msgspec
+
+    class _ModelEntry(msgspec.Struct, frozen=True):
+        """Wpis ENCODER_MODELS: {"model": ..., "prefix": ...}."""
+
+        model: str
+        prefix: str | None = ""
+
+    # Dekoder kompilowany raz; wpis to obiekt albo sama nazwa modelu
+    _decode_encoder_models = msgspec.json.Decoder(list[_ModelEntry | str]).decode
+except ImportError:  # msgspec opcjonalny - zostaje parser slownikowy
+    msgspec = None
+    _decode_encoder_models = None
+
+_HERE = Path(__file__).resolve().parent  # jeden realpath na proces
+env_path = _HERE / ".env"
+
+
+# Ustawiany po wczytaniu .env; procesy potomne (workery, reloader) dziedzicza environ i pomijaja parsowanie
+_DOTENV_SENTINEL = "_TDH_DOTENV_LOADED"
+
+
+@functools.cache
+def _load_env() -> None:
+    """Wczytuje .env tylko raz na proces (kolejne wywolania sa no-op)."""
+    if os.environ.get(_DOTENV_SENTINEL):
+        return
+    # Brak pliku -> load_dotenv jest no-op, osobny exists() (stat) zbedny.
+    # override=False: zmienne wyeksportowane wczesniej (np. przez shell/Docker) maja pierwszenstwo
+    load_dotenv(env_path, override=False)
+    os.environ[_DOTENV_SENTINEL] = "1"
+
+
+_load_env()
+
+
+# === Ustawienia ze zmiennych srodowiskowych ===
+
+
+@dataclass(slots=True, frozen=True)
+class Settings:
+    """Typowana konfiguracja procesu - budowana raz przy imporcie modulu."""
+
+    # Encoder
+    encoder_model_name: str
+    encoder_batch_size: int
+    encoder_max_seq_length: int
+    encoder_device: str
+    encoder_dtype: str
+    encoder_model_cache_size: int
+    # LLM (OpenAI / OpenAI-compatible)
+    openai_api_key: str
+    llm_base_url: str  # opcjonalnie: np. Azure, proxy, lokalny endpoint
+    llm_model: str
+    llm_temperature: float
+    llm_max_tokens: int
+    llm_retry_count: int
+    llm_max_concurrency: int
+    llm_label_batch_size: int
+    llm_label_cache_ttl: int
+    # Redis
+    redis_url: str
+    redis_prefix: str
+    redis_max_connections: int
+    embedding_cache_ttl: int
+    job_ttl: int
+    result_ttl: int
+    # UMAP
+    umap_n_neighbors: int
+    umap_min_dist: float
+    umap_metric: str
+    umap_backend: str
+    # Limity
+    min_texts: int
+    max_texts: int
+    max_text_length: int
+    pipeline_timeout_seconds: int
+    max_concurrent_jobs: int
+    # Serwer
+    host: str
+    port: int
+    uvicorn_reload: bool
+    cors_origins: tuple[str, ...]
+
+
+# (ENV, domyslna wartosc) - nazwa pola Settings = ENV.lower()
+_INT_ENVS: tuple[tuple[str, int], ...] = (
+    ("ENCODER_BATCH_SIZE", 64),
+    ("ENCODER_MAX_SEQ_LENGTH", 512),
+    ("ENCODER_MODEL_CACHE_SIZE", 2),
+    ("LLM_MAX_TOKENS", 2000),
+    ("LLM_RETRY_COUNT", 3),
+    ("LLM_MAX_CONCURRENCY", 8),
+    ("LLM_LABEL_BATCH_SIZE", 8),
+    ("LLM_LABEL_CACHE_TTL", 3600),  # 1h
+    ("EMBEDDING_CACHE_TTL", 7 * 24 * 3600),  # 7 days
+    ("JOB_TTL", 24 * 3600),  # 24h
+    ("RESULT_TTL", 48 * 3600),  # 48h
+    ("REDIS_MAX_CONNECTIONS", 64),
+    ("UMAP_N_NEIGHBORS", 15),
+    ("MIN_TEXTS", 10),
+    ("MAX_TEXTS", 50000),
+    ("MAX_TEXT_LENGTH", 5000),
+    ("PIPELINE_TIMEOUT_SECONDS", 600),
+    ("MAX_CONCURRENT_JOBS", 3),
+    ("PORT", 8000),
+)
+_FLOAT_ENVS: tuple[tuple[str, float], ...] = (
+    ("LLM_TEMPERATURE", 0.3),
+    ("UMAP_MIN_DIST", 0.1),
+)
+_STR_ENVS: tuple[tuple[str, str], ...] = (
+    ("ENCODER_MODEL_NAME", "answerdotai/ModernBERT-base"),
+    ("ENCODER_DEVICE", "auto"),
+    ("ENCODER_DTYPE", "auto"),
+    ("OPENAI_API_KEY", ""),
+    ("LLM_MODEL", "gpt-4o"),
+    ("REDIS_URL", "redis://localhost:6379/0"),
+    ("REDIS_PREFIX", "tdh:"),
+    ("UMAP_METRIC", "cosine"),
+    ("UMAP_BACKEND", "auto"),
+    ("HOST", "0.0.0.0"),
+)
+
+
+def _build_settings() -> Settings:
+    """Czyta zmienne srodowiskowe jeden raz i zwraca niemodyfikowalne Settings."""
+    env = os.environ
+    values: dict = {k.lower(): int(env.get(k, d)) for k, d in _INT_ENVS}
+    values.update({k.lower(): float(env.get(k, d)) for k, d in _FLOAT_ENVS})
+    values.update({k.lower(): env.get(k, d) for k, d in _STR_ENVS})
+    return Settings(
+        **values,
+        llm_base_url=env.get("LLM_BASE_URL", "").strip(),
+        uvicorn_reload=env.get("UVICORN_RELOAD", "0").strip().lower() in ("1", "true", "yes"),
+        cors_origins=tuple(
+            o for o in (o.strip() for o in env.get("CORS_ORIGINS", "http://localhost:3000").split(",")) if o
+        ),
+    )
+
+
+SETTINGS: Settings = _build_settings()
+
+# Ponizej aliasy modulowe - zachowuja istniejace importy `from config import ...`
 
 # === Encoder ===
-ENCODER_MODEL_NAME: str = os.getenv("ENCODER_MODEL_NAME", "answerdotai/ModernBERT-base")
-ENCODER_BATCH_SIZE: int = int(os.getenv("ENCODER_BATCH_SIZE", "64"))
-ENCODER_MAX_SEQ_LENGTH: int = int(os.getenv("ENCODER_MAX_SEQ_LENGTH", "512"))
-ENCODER_DEVICE: str = os.getenv("ENCODER_DEVICE", "auto")
+ENCODER_MODEL_NAME: str = SETTINGS.encoder_model_name
+ENCODER_BATCH_SIZE: int = SETTINGS.encoder_batch_size
+ENCODER_MAX_SEQ_LENGTH: int = SETTINGS.encoder_max_seq_length
+ENCODER_DEVICE: str = SETTINGS.encoder_device
+ENCODER_DTYPE: str = SETTINGS.encoder_dtype  # auto | float32 | float16 | bfloat16
+# Ile modeli ladowanych "na zyczenie" (encoderModel w configu joba) trzymac w pamieci (LRU)
+ENCODER_MODEL_CACHE_SIZE: int = SETTINGS.encoder_model_cache_size
+
+
+@functools.cache
+def resolve_encoder_device() -> tuple[str, str]:
+    """
+    Rozwiazuje ENCODER_DEVICE/ENCODER_DTYPE "auto" -> (device, dtype); liczone raz na proces.
+    torch importowany leniwie, zeby config dalo sie zaimportowac bez niego.
+    """
+    device, dtype = ENCODER_DEVICE, ENCODER_DTYPE
+    try:
+        import torch
+    except ImportError:
+        return ("cpu" if device == "auto" else device), ("float32" if dtype == "auto" else dtype)
+    if device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if dtype == "auto":
+        if device.startswith("cuda") and torch.cuda.is_available():
+            # bf16 od Ampere (compute capability 8.x), starsze GPU -> fp16
+            major, _ = torch.cuda.get_device_capability(torch.device(device))
+            dtype = "bfloat16" if major >= 8 else "float16"
+        else:
+            dtype = "float32"
+    return device, dtype
+
+
+@functools.cache
+def resolve_encoder_batch_size() -> int:
+    """
+    Batch size encodera. Jawne ENCODER_BATCH_SIZE ma pierwszenstwo; bez niego na GPU
+    dobierany z wolnej pamieci (torch.cuda.mem_get_info), na CPU domyslne 64.
+    """
+    if "ENCODER_BATCH_SIZE" in os.environ:
+        return ENCODER_BATCH_SIZE
+    device, dtype = resolve_encoder_device()
+    if not device.startswith("cuda"):
+        return ENCODER_BATCH_SIZE
+    try:
+        import torch
+
+        free, _ = torch.cuda.mem_get_info(torch.device(device))
+    except Exception:
+        return ENCODER_BATCH_SIZE
+    # Przyblizenie aktywacji na probke: seq_len x hidden (768) x ~4 warstwy posrednie x bajty/elem x zapas 6
+    bytes_per_elem = 4 if dtype == "float32" else 2
+    approx_mb_per_sample = ENCODER_MAX_SEQ_LENGTH * 4 * 768 * bytes_per_elem / 1e6 * 6
+    return max(8, min(256, int(free / 1e6 * 0.6 / approx_mb_per_sample)))
 
 # Lista modeli do embeddingów; każdy może mieć opcjonalny prefix (do embeddowania trafi prefix + tekst).
 # Format JSON: [{"model": "nazwa/modelu", "prefix": ""}, ...]. Pusty prefix = brak.
-# Domyślnie: jeden model z ENCODER_MODEL_NAME.
-def _parse_encoder_models() -> list[dict]:
+# Domyślnie: jeden model z ENCODER_MODEL_NAME. Parsowane raz, wynik cache'owany.
+@functools.cache
+def get_encoder_models() -> list[dict]:
     raw = os.getenv("ENCODER_MODELS", "").strip()
     if not raw:
         return [{"model": ENCODER_MODEL_NAME, "prefix": ""}]
+    if _decode_encoder_models is not None:
+        try:
+            out = [
+                {"model": e.strip(), "prefix": ""} if isinstance(e, str)
+                else {"model": e.model.strip(), "prefix": e.prefix or ""}
+                for e in _decode_encoder_models(raw.encode())
+            ]
+            return out if out else [{"model": ENCODER_MODEL_NAME, "prefix": ""}]
+        except msgspec.MsgspecError:
+            pass  # niestandardowy ksztalt - ponizej tolerancyjny parser
     try:
-        data = json.loads(raw)
+        data = _json_loads(raw.encode())
         if not isinstance(data, list):
             return [{"model": ENCODER_MODEL_NAME, "prefix": ""}]
         out = []
@@ -42,58 +255,81 @@ def _parse_encoder_models() -> list[dict]:
         return [{"model": ENCODER_MODEL_NAME, "prefix": ""}]
 
 
-ENCODER_MODELS: list[dict] = _parse_encoder_models()
+ENCODER_MODELS: list[dict] = get_encoder_models()
 
 # === LLM (OpenAI / OpenAI-compatible) ===
-OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "").strip()  # opcjonalnie: np. Azure, proxy, lokalny endpoint
-LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o")
-LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", "2000"))
-LLM_RETRY_COUNT: int = int(os.getenv("LLM_RETRY_COUNT", "3"))
+OPENAI_API_KEY: str = SETTINGS.openai_api_key
+LLM_BASE_URL: str = SETTINGS.llm_base_url
+LLM_MODEL: str = SETTINGS.llm_model
+LLM_TEMPERATURE: float = SETTINGS.llm_temperature
+LLM_MAX_TOKENS: int = SETTINGS.llm_max_tokens
+LLM_RETRY_COUNT: int = SETTINGS.llm_retry_count
+LLM_MAX_CONCURRENCY: int = SETTINGS.llm_max_concurrency  # max rownoleglych wywolan LLM w procesie (rate limit)
+LLM_LABEL_BATCH_SIZE: int = SETTINGS.llm_label_batch_size  # klastrow na jedno zapytanie labelujace; <=1 wylacza batch
+LLM_LABEL_CACHE_TTL: int = SETTINGS.llm_label_cache_ttl  # cache etykiet/slow kluczowych w Redis; 0 wylacza
 
 # === Redis ===
-REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-REDIS_PREFIX: str = os.getenv("REDIS_PREFIX", "tdh:")
-EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))  # 7 days
-JOB_TTL: int = int(os.getenv("JOB_TTL", str(24 * 3600)))  # 24h
-RESULT_TTL: int = int(os.getenv("RESULT_TTL", str(48 * 3600)))  # 48h
+REDIS_URL: str = SETTINGS.redis_url
+REDIS_PREFIX: str = SETTINGS.redis_prefix
+REDIS_MAX_CONNECTIONS: int = SETTINGS.redis_max_connections  # wspolna pula polaczen procesu
+EMBEDDING_CACHE_TTL: int = SETTINGS.embedding_cache_ttl
+JOB_TTL: int = SETTINGS.job_ttl
+RESULT_TTL: int = SETTINGS.result_ttl
+# Gotowy prefiks (bytes) kluczy embeddingow - klucz = prefiks + job_id bez f-stringa i ponownego kodowania
+REDIS_KEY_EMBEDDINGS_PREFIX: bytes = (REDIS_PREFIX + "embeddings:").encode("utf-8")
 
 # === UMAP ===
-UMAP_N_NEIGHBORS: int = int(os.getenv("UMAP_N_NEIGHBORS", "15"))
-UMAP_MIN_DIST: float = float(os.getenv("UMAP_MIN_DIST", "0.1"))
-UMAP_METRIC: str = os.getenv("UMAP_METRIC", "cosine")
+UMAP_N_NEIGHBORS: int = SETTINGS.umap_n_neighbors
+UMAP_MIN_DIST: float = SETTINGS.umap_min_dist
+UMAP_METRIC: str = SETTINGS.umap_metric
+UMAP_BACKEND: str = SETTINGS.umap_backend  # auto | cpu | cuml (auto: cuML gdy zainstalowany i jest GPU)
 
 # === HDBSCAN - mapowanie granularity ===
-GRANULARITY_CONFIG: dict = {
-    "low": {
+# Tylko do odczytu; wywolujacy robia .copy() przed modyfikacja parametrow.
+GRANULARITY_CONFIG: MappingProxyType = MappingProxyType({
+    "low": MappingProxyType({
         "min_cluster_size": 50,
         "min_samples": 15,
         "cluster_selection_epsilon": 0.5,
-    },
-    "medium": {
+    }),
+    "medium": MappingProxyType({
         "min_cluster_size": 20,
         "min_samples": 8,
         "cluster_selection_epsilon": 0.3,
-    },
-    "high": {
+    }),
+    "high": MappingProxyType({
         "min_cluster_size": 8,
         "min_samples": 3,
         "cluster_selection_epsilon": 0.1,
-    },
-}
+    }),
+})
 
 # === Limity ===
-MIN_TEXTS: int = int(os.getenv("MIN_TEXTS", "10"))
-MAX_TEXTS: int = int(os.getenv("MAX_TEXTS", "50000"))
-MAX_TEXT_LENGTH: int = int(os.getenv("MAX_TEXT_LENGTH", "5000"))
-PIPELINE_TIMEOUT_SECONDS: int = int(os.getenv("PIPELINE_TIMEOUT_SECONDS", "600"))
-MAX_CONCURRENT_JOBS: int = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
+MIN_TEXTS: int = SETTINGS.min_texts
+MAX_TEXTS: int = SETTINGS.max_texts
+MAX_TEXT_LENGTH: int = SETTINGS.max_text_length
+PIPELINE_TIMEOUT_SECONDS: int = SETTINGS.pipeline_timeout_seconds
+MAX_CONCURRENT_JOBS: int = SETTINGS.max_concurrent_jobs
 
 # === Serwer ===
-HOST: str = os.getenv("HOST", "0.0.0.0")
-PORT: int = int(os.getenv("PORT", "8000"))
-CORS_ORIGINS: list[str] = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+HOST: str = SETTINGS.host
+PORT: int = SETTINGS.port
+UVICORN_RELOAD: bool = SETTINGS.uvicorn_reload  # tylko dev - reload przeladowuje caly stos (torch)
+
+
+def _cors_origin_regex(origins: tuple[str, ...]) -> str | None:
+    """Wzorce z '*' (np. https://*.bank.pl) -> jeden regex dla allow_origin_regex."""
+    patterns = [
+        re.escape(o).replace(r"\*", "[^/]*")
+        for o in origins
+        if "*" in o and o != "*"
+    ]
+    return "|".join(patterns) if patterns else None
+
+
+# Dokladne originy (bez wzorcow) -> allow_origins; wzorce -> allow_origin_regex
+CORS_ORIGINS: tuple[str, ...] = tuple(o for o in SETTINGS.cors_origins if "*" not in o or o == "*")
+CORS_ORIGIN_REGEX: str | None = _cors_origin_regex(SETTINGS.cors_origins)
 
 # === Kolory klastrow ===
 CLUSTER_COLORS: list[str] = [
@@ -104,7 +340,7 @@ CLUSTER_COLORS: list[str] = [
 ]
 
 # === Polskie stop words ===
-POLISH_STOP_WORDS: list[str] = [
+POLISH_STOP_WORDS: frozenset[str] = frozenset((
     "i", "w", "na", "z", "do", "nie", "sie", "o", "to", "jak",
     "ale", "za", "co", "jest", "od", "po", "ze", "czy", "tak",
     "go", "tego", "ja", "juz", "by", "tym", "tu", "te", "ten",
@@ -112,4 +348,6 @@ POLISH_STOP_WORDS: list[str] = [
     "byl", "byla", "bylo", "byly", "bedzie", "mi", "sie", "sobie",
     "moze", "bardzo", "tylko", "jeszcze", "tez", "dla", "przy",
     "prosze", "dziekuje", "chcialabym", "chcialbym", "mam", "moge",
-]
+))
+# sklearn (TfidfVectorizer stop_words) akceptuje tylko liste
+POLISH_STOP_WORDS_LIST: list[str] = sorted(POLISH_STOP_WORDS)
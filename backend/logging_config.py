@@ -0,0 +1,82 @@
+"""
+Topic Discovery Hub - Logging
+Handler na stdout konfigurowany przy imporcie (logi INFO z importu modulow nie gina);
+lifespan przelacza root logger na QueueHandler + watek QueueListener i z powrotem.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+
+class FastFormatter(logging.Formatter):
+    """Formatter z cache'owanym znacznikiem czasu - jedno strftime na sekunde zamiast na rekord."""
+
+    _last: tuple[int, str] = (-1, "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+        sec = int(record.created)
+        last_sec, stamp = FastFormatter._last
+        if sec != last_sec:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+            FastFormatter._last = (sec, stamp)
+        return f"{stamp},{int(record.msecs):03d}"
+
+
+# Format nie uzywa process/thread - pomijamy ich wyznaczanie przy kazdym LogRecord
+logging.logProcesses = False
+logging.logThreads = False
+logging.logMultiprocessing = False
+
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(FastFormatter("%(asctime)s | %(levelname)-7s | %(name)s | %(message)s"))
+_log_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.handlers.QueueHandler | None = None
+
+
+def _configure_root() -> None:
+    """Root logger -> stdout (synchronicznie) na INFO; wywolywane raz przy imporcie."""
+    root = logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+    root.addHandler(_stream_handler)
+    root.setLevel(logging.INFO)
+
+
+def start_queue_logging() -> None:
+    """
+    Root logger -> QueueHandler; zapis na stdout robi watek QueueListener.
+    Emit w watku zadania (np. encoder.load) to tylko put() do kolejki, bez I/O i locka streamu.
+    """
+    global _log_listener, _queue_handler
+    if _log_listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _log_listener = logging.handlers.QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+    _log_listener.start()
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.removeHandler(_stream_handler)
+    atexit.register(stop_queue_logging)
+
+
+def stop_queue_logging() -> None:
+    """Oproznia kolejke logow, zatrzymuje watek listenera i wraca do zapisu wprost na stdout."""
+    global _log_listener, _queue_handler
+    if _log_listener is None:
+        return
+    root = logging.getLogger()
+    root.addHandler(_stream_handler)
+    root.removeHandler(_queue_handler)
+    _log_listener.stop()
+    _log_listener = None
+    _queue_handler = None
+
+
+_configure_root()
@@ -4,28 +4,34 @@ Topic Discovery Hub - FastAPI Application
 
 from __future__ import annotations
 
+import importlib.util
 import logging
-import sys
 from contextlib import asynccontextmanager
 
+import orjson
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-from config import HOST, PORT, CORS_ORIGINS, ENCODER_MODELS, LLM_BASE_URL, LLM_MODEL, REDIS_URL
+# Pierwszy import projektu - handler logow gotowy, zanim inne moduly zaczna logowac
+import logging_config
+from responses import ORJSONResponse
+from routers.cluster import router as cluster_router
+from routers.export import router as export_router
+from routers.health import router as health_router
 from services.encoder import EncoderService
 from services.job_queue import JobQueueService
+from services.llm import LLMService
+from config import HOST, PORT, UVICORN_RELOAD, CORS_ORIGINS, CORS_ORIGIN_REGEX, ENCODER_MODELS, LLM_BASE_URL, LLM_MODEL, REDIS_URL
+
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-7s | %(name)s | %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)],
-)
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    logging_config.start_queue_logging()
     logger.info("=" * 60)
     logger.info("Topic Discovery Hub - Backend Start")
     logger.info(
@@ -33,7 +39,7 @@ async def lifespan(app: FastAPI):
     )
     logger.info(f"  LLM:     {LLM_MODEL}" + (f" (base_url: {LLM_BASE_URL})" if LLM_BASE_URL else ""))
     logger.info(f"  Redis:   {REDIS_URL}")
-    logger.info(f"  CORS:    {CORS_ORIGINS}")
+    logger.info(f"  CORS:    {CORS_ORIGINS}" + (f" (regex: {CORS_ORIGIN_REGEX})" if CORS_ORIGIN_REGEX else ""))
     logger.info("=" * 60)
 
     # Pre-load encoder
@@ -57,7 +63,9 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     await jobs.close()
+    await LLMService.get_instance().close()
     logger.info("Server shutdown.")
+    logging_config.stop_queue_logging()
 
 
 app = FastAPI(
@@ -65,36 +73,49 @@ app = FastAPI(
     description="Backend API for automatic topic discovery in text documents.",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# Kompresja duzych odpowiedzi (wyniki jobow, eksporty CSV/JSON/TXT); CORS pozostaje najbardziej zewnetrzny
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
+    allow_origin_regex=CORS_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-from routers.cluster import router as cluster_router
-from routers.export import router as export_router
-from routers.health import router as health_router
-
+# Routery na poziomie modulu - trasy /api istnieja niezaleznie od tego, czy host uruchamia lifespan
 app.include_router(cluster_router, prefix="/api")
 app.include_router(export_router, prefix="/api")
 app.include_router(health_router, prefix="/api")
 
+# Statyczna odpowiedz "/" - serializowana raz przy imporcie
+ROOT_BYTES: bytes = orjson.dumps({
+    "service": "Topic Discovery Hub API",
+    "version": "2.0.0",
+    "docs": "/docs",
+    "health": "/api/health",
+})
+
 
 @app.get("/", tags=["root"])
 async def root():
-    return {
-        "service": "Topic Discovery Hub API",
-        "version": "2.0.0",
-        "docs": "/docs",
-        "health": "/api/health",
-    }
+    return Response(content=ROOT_BYTES, media_type="application/json")
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host=HOST, port=PORT, reload=False, log_level="info")
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        reload=UVICORN_RELOAD,
+        # uvloop/httptools z uvicorn[standard]; brak uvloop (np. Windows) -> zwykly asyncio
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        log_level="info",
+    )
@@ -8,12 +8,20 @@ Endpoints: POST /cluster (submit job), GET /cluster/job/{id},
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+from collections import defaultdict
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import TypeAdapter
 
 from schemas import (
+    ClusterTopic,
+    DocumentItem,
+    LLMSuggestion,
     ClusterRequest,
     ReclusterRequest,
     RefineRequest,
@@ -28,17 +36,72 @@ from schemas import (
     UndoRequest,
     ErrorResponse,
 )
+from responses import ORJSONResponse
 from services.pipeline import PipelineService
 from services.job_queue import JobQueueService
 from services.llm import LLMService
-from config import MIN_TEXTS, MAX_TEXTS, MAX_TEXT_LENGTH, ENCODER_MODELS
+from config import MIN_TEXTS, MAX_TEXTS, MAX_TEXT_LENGTH, ENCODER_MODELS, LLM_LABEL_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/cluster", tags=["clustering"])
 
+# ENCODER_MODELS jest stala procesu - odpowiedz /encoders serializowana raz
+_ENCODERS_BODY: bytes = orjson.dumps({"models": [c["model"] for c in ENCODER_MODELS]})
+
+# Zrzut calych list jednym wywolaniem serializatora pydantic-core (zamiast model_dump per element)
+_DOCS_ADAPTER = TypeAdapter(list[DocumentItem])
+_TOPICS_ADAPTER = TypeAdapter(list[ClusterTopic])
+_SUGGESTIONS_ADAPTER = TypeAdapter(list[LLMSuggestion])
+
 
 def get_pipeline() -> PipelineService:
-    return PipelineService()
+    return PipelineService.get_instance()
+
+
+def _utcnow_iso() -> str:
+    """Znacznik czasu odpowiedzi (UTC, ISO 8601, milisekundy)."""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _check_text_count(count: int, prefix: str) -> None:
+    """400 TOO_FEW_TEXTS / TOO_MANY_TEXTS gdy liczba tekstow poza [MIN_TEXTS, MAX_TEXTS]."""
+    if count < MIN_TEXTS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "TOO_FEW_TEXTS",
+                "message": f"{prefix} {count} texts (min {MIN_TEXTS}).",
+            },
+        )
+    if count > MAX_TEXTS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "TOO_MANY_TEXTS",
+                "message": f"{prefix} {count} texts (max {MAX_TEXTS}).",
+            },
+        )
+
+
+def _submission_digest(texts: list[str], config: dict) -> str:
+    """Klucz deduplikacji submit: blake2b(teksty + config z posortowanymi kluczami)."""
+    h = hashlib.blake2b(digest_size=16)
+    for t in texts:
+        h.update(t.encode())
+        h.update(b"\n")
+    h.update(orjson.dumps(config, default=str, option=orjson.OPT_SORT_KEYS))
+    return h.hexdigest()
+
+
+def _clean_texts(raw_texts: list[str]) -> list[str]:
+    """Jeden przebieg: przyciecie + strip raz na tekst, puste odrzucone."""
+    texts = []
+    append = texts.append
+    for t in raw_texts:
+        t = t[:MAX_TEXT_LENGTH].strip()
+        if t:
+            append(t)
+    return texts
 
 
 # ================================================================
@@ -71,59 +134,34 @@ async def submit_cluster_job(req: ClusterRequest):
             )
 
         # Validate number of texts from cache
-        if len(cached_texts) < MIN_TEXTS:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": "TOO_FEW_TEXTS",
-                    "message": f"Cached job has {len(cached_texts)} texts (min {MIN_TEXTS}).",
-                },
-            )
-        if len(cached_texts) > MAX_TEXTS:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": "TOO_MANY_TEXTS",
-                    "message": f"Cached job has {len(cached_texts)} texts (max {MAX_TEXTS}).",
-                },
-            )
+        _check_text_count(len(cached_texts), "Cached job has")
 
         # Use texts from cache
         texts = cached_texts
     else:
-        # Normal validation for provided texts
-        if len(req.texts) < MIN_TEXTS:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": "TOO_FEW_TEXTS",
-                    "message": f"Min {MIN_TEXTS} texts, got {len(req.texts)}.",
-                },
-            )
-        if len(req.texts) > MAX_TEXTS:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": "TOO_MANY_TEXTS",
-                    "message": f"Max {MAX_TEXTS} texts, got {len(req.texts)}.",
-                },
-            )
-
-        texts = [t[:MAX_TEXT_LENGTH].strip() for t in req.texts if t.strip()]
-        if len(texts) < MIN_TEXTS:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "code": "TOO_FEW_TEXTS",
-                    "message": f"After filtering: {len(texts)} texts (min {MIN_TEXTS}).",
-                },
-            )
+        # Limit na surowej liczbie - zbyt duze zadanie odrzucone przed przycinaniem tekstow
+        _check_text_count(len(req.texts), "Got")
+        texts = _clean_texts(req.texts)
+        _check_text_count(len(texts), "After filtering:")
 
     try:
         config = req.config.model_dump(by_alias=True)
         config["iteration"] = req.iteration
+
+        # Ponowne wyslanie tych samych tekstow i configu (retry w UI) -> istniejacy job, o ile jeszcze w toku
+        digest = await asyncio.to_thread(_submission_digest, texts, config)
+        existing = await jobs.find_duplicate_job(digest)
+        if existing:
+            logger.info(f"Duplicate submission, reusing job {existing['jobId']}")
+            return {"jobId": existing["jobId"], "status": existing["status"], "deduplicated": True}
+
         pipeline = get_pipeline()
         job_id = await pipeline.submit_job(texts, config)
+        # Job juz w kolejce - blad zapisu digestu nie moze zamienic odpowiedzi w 500 (traci sie tylko dedup)
+        try:
+            await jobs.remember_job(digest, job_id)
+        except Exception as e:
+            logger.warning(f"Dedup digest write failed for job {job_id}: {e}")
         return {"jobId": job_id, "status": "queued"}
     except RuntimeError as e:
         raise HTTPException(
@@ -155,8 +193,7 @@ async def submit_cluster_job(req: ClusterRequest):
     description="Returns model names that can be used as encoderModel in job config.",
 )
 async def list_encoders():
-    models = [c["model"] for c in ENCODER_MODELS]
-    return {"models": models}
+    return Response(content=_ENCODERS_BODY, media_type="application/json")
 
 
 # ================================================================
@@ -172,7 +209,7 @@ async def list_encoders():
 async def list_jobs():
     jobs = JobQueueService.get_instance()
     all_jobs = await jobs.list_jobs()
-    return {"jobs": all_jobs}
+    return ORJSONResponse({"jobs": all_jobs})
 
 
 # ================================================================
@@ -197,15 +234,15 @@ async def get_job_status(job_id: str):
             },
         )
 
-    response = {**job_info}
-
-    # If completed, include the result
+    # If completed, include the result - surowy JSON z Redis wklejany bez parsowania
+    # (job_info to swiezy dict z get_job - bez kopiowania)
     if job_info.get("status") == "completed":
-        result = await jobs.get_result(job_id)
-        if result:
-            response["result"] = result
+        raw_result = await jobs.get_result_raw(job_id)
+        if raw_result:
+            job_info["result"] = orjson.Fragment(raw_result)
 
-    return response
+    # Duzy payload (result) - zwracany wprost, bez jsonable_encoder
+    return ORJSONResponse(job_info)
 
 
 # ================================================================
@@ -290,9 +327,9 @@ async def refine_clusters(req: RefineRequest):
             },
         )
     try:
-        llm = LLMService()
-        topics_data = [t.model_dump(by_alias=True) for t in req.topics]
-        prev_data = [s.model_dump(by_alias=True) for s in req.previous_suggestions]
+        llm = LLMService.get_instance()
+        topics_data = _TOPICS_ADAPTER.dump_python(req.topics, by_alias=True)
+        prev_data = _SUGGESTIONS_ADAPTER.dump_python(req.previous_suggestions, by_alias=True)
         result = await llm.generate_refinement_suggestions(
             topics=topics_data,
             total_docs=len(req.documents),
@@ -339,10 +376,11 @@ async def rename_topic(req: RenameRequest):
     # Update result in Redis if job_id provided
     if req.job_id:
         jobs = JobQueueService.get_instance()
-        result = await jobs.get_result(req.job_id)
+        raw_result = await jobs.get_result_raw(req.job_id)
+        result = orjson.loads(raw_result) if raw_result else None
         if result:
-            # Save checkpoint for undo before changing
-            await jobs.push_undo(req.job_id, result)
+            # Save checkpoint for undo before changing (stored bytes, bez ponownej serializacji)
+            await jobs.push_undo_raw(req.job_id, raw_result)
             # Preserve jobId and meta from existing result
             old_label = ""
             # Update topic label in result
@@ -362,22 +400,76 @@ async def rename_topic(req: RenameRequest):
 
             # Save updated result
             await jobs.update_result(req.job_id, result)
-            return {
+            return ORJSONResponse({
                 "topicId": req.topic_id,
                 "oldLabel": old_label,
                 "newLabel": req.new_label.strip(),
                 "updated": True,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
+                "timestamp": _utcnow_iso(),
+            })
 
     logger.info(f"Topic {req.topic_id} renamed to '{req.new_label.strip()}'")
-    return {
+    return ORJSONResponse({
         "topicId": req.topic_id,
         "oldLabel": "",
         "newLabel": req.new_label.strip(),
         "updated": True,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-    }
+        "timestamp": _utcnow_iso(),
+    })
+
+
+async def _documents_and_topics(
+    req: MergeRequest | ReclassifyRequest,
+) -> tuple[list[dict], list[dict], bytes | None]:
+    """
+    Dokumenty i topiki operacji: z requestu albo - gdy pominiete - z zapisanego wyniku joba.
+    Wynik z Redis to JSON zapisany przez serwer: orjson.loads bez walidacji pydantic tysiecy elementow.
+    Trzeci element to surowe bajty wyniku (gdy wczytany) - do checkpointu undo bez drugiego GET.
+    """
+    if req.documents is not None and req.topics is not None:
+        return (
+            _DOCS_ADAPTER.dump_python(req.documents, by_alias=True),
+            _TOPICS_ADAPTER.dump_python(req.topics, by_alias=True),
+            None,
+        )
+    if req.documents is not None or req.topics is not None:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "INVALID_INPUT",
+                "message": "documents and topics must be given together.",
+            },
+        )
+    if not req.job_id:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "INVALID_INPUT",
+                "message": "documents and topics required when jobId is not given.",
+            },
+        )
+    raw_result = await JobQueueService.get_instance().get_result_raw(req.job_id)
+    if raw_result is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "code": "JOB_NOT_FOUND",
+                "message": f"No stored result for job {req.job_id}.",
+            },
+        )
+    result = orjson.loads(raw_result)
+    return result.get("documents", []), result.get("topics", []), raw_result
+
+
+async def _checkpoint(job_id: str | None, raw_result: bytes | None) -> None:
+    """Zapis wyniku na stos undo; juz wczytane bajty wyniku wrzucane wprost (bez ponownego GET)."""
+    if not job_id:
+        return
+    jobs = JobQueueService.get_instance()
+    if raw_result is not None:
+        await jobs.push_undo_raw(job_id, raw_result)
+    else:
+        await jobs.checkpoint_result(job_id)
 
 
 # ================================================================
@@ -395,16 +487,14 @@ async def merge_clusters(req: MergeRequest):
                 "message": "Need 2+ clusters.",
             },
         )
-    if req.job_id:
-        jobs = JobQueueService.get_instance()
-        current = await jobs.get_result(req.job_id)
-        if current:
-            await jobs.push_undo(req.job_id, current)
+    docs, tops, raw_result = await _documents_and_topics(req)
+    await _checkpoint(req.job_id, raw_result)
     try:
         pipeline = get_pipeline()
-        docs = [d.model_dump(by_alias=True) for d in req.documents]
-        tops = [t.model_dump(by_alias=True) for t in req.topics]
-        return await pipeline.merge_clusters(req.cluster_ids, req.new_label, docs, tops, req.job_id)
+        # Pelna lista dokumentow - orjson wprost, bez rekurencyjnego jsonable_encoder FastAPI
+        return ORJSONResponse(
+            await pipeline.merge_clusters(req.cluster_ids, req.new_label, docs, tops, req.job_id)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail={"code": "INVALID_INPUT", "message": str(e)})
     except Exception as e:
@@ -435,16 +525,11 @@ async def reclassify_documents(req: ReclassifyRequest):
                 "message": "Number of clusters must be at least 1.",
             },
         )
-    if req.job_id:
-        jobs = JobQueueService.get_instance()
-        current = await jobs.get_result(req.job_id)
-        if current:
-            await jobs.push_undo(req.job_id, current)
+    docs, tops, raw_result = await _documents_and_topics(req)
+    await _checkpoint(req.job_id, raw_result)
     try:
         pipeline = get_pipeline()
-        docs = [d.model_dump(by_alias=True) for d in req.documents]
-        tops = [t.model_dump(by_alias=True) for t in req.topics]
-        return await pipeline.reclassify_documents(
+        result = await pipeline.reclassify_documents(
             req.from_cluster_ids,
             req.num_clusters,
             docs,
@@ -452,6 +537,7 @@ async def reclassify_documents(req: ReclassifyRequest):
             req.job_id,
             req.generate_labels,
         )
+        return ORJSONResponse(result)
     except Exception as e:
         logger.exception(f"Reclassify error: {e}")
         raise HTTPException(status_code=500, detail={"code": "PIPELINE_ERROR", "message": str(e)})
@@ -477,7 +563,7 @@ async def save_checkpoint(req: SaveCheckpointRequest):
 @router.post("/undo", summary="Restore previous result from undo stack")
 async def undo_cluster_operation(req: UndoRequest):
     jobs = JobQueueService.get_instance()
-    prev = await jobs.pop_undo(req.job_id)
+    prev = await jobs.pop_undo_raw(req.job_id)
     if prev is None:
         raise HTTPException(
             status_code=404,
@@ -486,7 +572,37 @@ async def undo_cluster_operation(req: UndoRequest):
                 "message": "Brak zapisanej wersji do cofnięcia.",
             },
         )
-    return prev
+    # Zapisany JSON wynikowy zwracany bez parsowania
+    return Response(content=prev, media_type="application/json")
+
+
+def _content_digest(*parts: str) -> str:
+    """Klucz cache z tresci (blake2b, 128 bit)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+async def _cache_read(getter, digests: list[str]) -> list:
+    """Odczyt z cache etykiet; blad Redis lub wylaczony cache = same chybienia."""
+    if not digests or LLM_LABEL_CACHE_TTL <= 0:
+        return [None] * len(digests)
+    try:
+        return await getter(digests)
+    except Exception as e:
+        logger.warning(f"Label cache read failed: {e}")
+        return [None] * len(digests)
+
+
+async def _cache_write(setter, entries: dict) -> None:
+    if not entries or LLM_LABEL_CACHE_TTL <= 0:
+        return
+    try:
+        await setter(entries)
+    except Exception as e:
+        logger.warning(f"Label cache write failed: {e}")
 
 
 # ================================================================
@@ -507,62 +623,112 @@ async def generate_labels(req: GenerateLabelsRequest):
             },
         )
     try:
-        llm = LLMService()
+        llm = LLMService.get_instance()
         jobs = JobQueueService.get_instance()
 
-        # Get texts and embeddings if job_id provided
-        texts = None
-        all_embeddings = None
-        if req.job_id:
-            texts = await jobs.get_texts(req.job_id)
-            all_embeddings = await jobs.get_cached_embeddings(req.job_id)
+        # Dokumenty czytane wprost z modeli requestu (potrzebne tylko clusterId i text)
+        topics_data = _TOPICS_ADAPTER.dump_python(req.topics, by_alias=True)
 
-        # Get documents for selected topics
-        docs_data = [d.model_dump(by_alias=True) for d in req.documents]
-        topics_data = [t.model_dump(by_alias=True) for t in req.topics]
+        from services.clustering import ClusteringService
 
-        updated_topics = []
-        for topic in topics_data:
-            if topic["id"] not in req.topic_ids:
-                updated_topics.append(topic)
-                continue
+        clustering = ClusteringService.get_instance()
 
-            # Get documents for this topic
-            topic_docs = [d for d in docs_data if d.get("clusterId") == topic["id"]]
-            if not topic_docs:
-                updated_topics.append(topic)
-                continue
+        selected_ids = set(req.topic_ids)
+        # Teksty wszystkich klastrow pogrupowane jednym przebiegiem - c-TF-IDF liczony na calym podziale joba,
+        # wiec slowa kluczowe klastra nie zaleza od tego, co jeszcze zaznaczono w tym requescie
+        texts_by_cluster: dict[int, list[str]] = defaultdict(list)
+        for d in req.documents:
+            texts_by_cluster[d.cluster_id].append(d.text)
+        digest_by_cluster = {cid: _content_digest(*texts) for cid, texts in texts_by_cluster.items()}
+        # Kontekst = caly podzial (klaster -> tresc); wchodzi do kluczy cache slow kluczowych i etykiet
+        partition_digest = _content_digest(*(f"{cid}:{digest_by_cluster[cid]}" for cid in sorted(digest_by_cluster)))
 
+        updated_topics = list(topics_data)
+        positions: list[int] = []
+        pending: list[dict] = []
+        for i, topic in enumerate(topics_data):
+            if topic["id"] not in selected_ids:
+                continue
             # Get texts for this topic
-            topic_texts = []
-            if texts:
-                topic_texts = [d["text"] for d in topic_docs]
-            else:
-                topic_texts = [d.get("text", "") for d in topic_docs]
-
-            # Extract keywords
-            from services.clustering import ClusteringService
-
-            clustering = ClusteringService()
-            keywords = clustering.extract_keywords(topic_texts)
+            topic_texts = texts_by_cluster.get(topic["id"])
+            if not topic_texts:
+                continue
 
-            # Get sample texts
             samples = topic["sampleTexts"][:10] if topic.get("sampleTexts") else topic_texts[:10]
+            keywords_digest = _content_digest(partition_digest, digest_by_cluster[topic["id"]])
+            positions.append(i)
+            pending.append(
+                {
+                    "id": topic["id"],
+                    "texts": topic_texts,
+                    "samples": samples,
+                    "doc_count": len(topic_texts),
+                    "coherence": topic.get("coherenceScore", 0.7),
+                    "keywords_digest": keywords_digest,
+                    "label_digest": _content_digest(keywords_digest, llm.model, *samples),
+                }
+            )
 
-            # Generate label using LLM
-            labeled = await llm.label_cluster(
-                cluster_id=topic["id"],
-                doc_count=len(topic_docs),
-                coherence=topic.get("coherenceScore", 0.7),
-                sample_texts=samples,
-                keywords=keywords,
+        # Cache etykiet i slow kluczowych (klucz z tresci klastra + model) - powtorne wywolanie bez LLM
+        cached_labels = await _cache_read(jobs.get_cached_labels, [item["label_digest"] for item in pending])
+        misses = [item for item, cached in zip(pending, cached_labels) if cached is None]
+        cached_keywords = await _cache_read(jobs.get_cached_keywords, [item["keywords_digest"] for item in misses])
+        to_extract = []
+        for item, keywords in zip(misses, cached_keywords):
+            if keywords is None:
+                to_extract.append(item)
+            else:
+                item["keywords"] = keywords
+
+        # Slowa kluczowe brakujacych klastrow jednym c-TF-IDF na wszystkich klastrach joba
+        new_keywords: dict[str, list[str]] = {}
+        if to_extract:
+            # sklearn (tokenizacja + macierz rzadka) w watku - nie blokuje event loopa
+            keywords_map = await asyncio.to_thread(
+                clustering.extract_keywords_grouped,
+                [text for texts in texts_by_cluster.values() for text in texts],
+                [cid for cid, texts in texts_by_cluster.items() for _ in texts],
+            )
+            for item in to_extract:
+                item["keywords"] = new_keywords[item["keywords_digest"]] = keywords_map.get(item["id"], [])
+
+        # Jedno zapytanie na kilka klastrow; gdy batch wylaczony - rownolegle po jednym
+        try:
+            labeled_misses = await llm.label_clusters_batch(misses) if misses else []
+        except NotImplementedError:
+            labeled_misses = await asyncio.gather(
+                *(
+                    llm.label_cluster(
+                        cluster_id=item["id"],
+                        doc_count=item["doc_count"],
+                        coherence=item["coherence"],
+                        sample_texts=item["samples"],
+                        keywords=item["keywords"],
+                    )
+                    for item in misses
+                )
             )
 
+        # Etykiety awaryjne (z keywords po bledzie LLM) nie trafiaja do cache
+        await _cache_write(jobs.cache_keywords, new_keywords)
+        await _cache_write(
+            jobs.cache_labels,
+            {
+                item["label_digest"]: labeled
+                for item, labeled in zip(misses, labeled_misses)
+                if not labeled.get("fallback")
+            },
+        )
+
+        fresh = iter(labeled_misses)
+        for i, cached in zip(positions, cached_labels):
+            labeled = cached if cached is not None else next(fresh)
             # Update topic with new label
+            topic = topics_data[i]
             updated_topic = topic.copy()
             updated_topic["label"] = labeled.get("label", topic["label"])
             updated_topic["description"] = labeled.get("description", topic.get("description", ""))
-            updated_topics.append(updated_topic)
+            updated_topics[i] = updated_topic
 
         # Update result in Redis if job_id provided
         if req.job_id:
@@ -574,10 +740,12 @@ async def generate_labels(req: GenerateLabelsRequest):
                     result["meta"] = {}
                 await jobs.update_result(req.job_id, result)
 
-        return {
+        # Topiki to zrzut zwalidowanego requestu (komplet pol, camelCase) - response_model tylko do OpenAPI,
+        # Response zwracany wprost pomija ponowna walidacje kazdego ClusterTopic
+        return ORJSONResponse({
             "updatedTopics": updated_topics,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-        }
+            "timestamp": _utcnow_iso(),
+        })
     except Exception as e:
         logger.exception(f"Generate labels error: {e}")
         raise HTTPException(status_code=500, detail={"code": "LLM_ERROR", "message": str(e)})
@@ -10,15 +10,61 @@ import csv
 import io
 import logging
 from datetime import datetime, timezone
+from itertools import islice
+from operator import attrgetter
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
-from schemas import ExportRequest, ErrorResponse
+from responses import ORJSONResponse
+from schemas import ExportRequest, ErrorResponse, LLMSuggestion
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/cluster", tags=["export"])
 
+_CSV_CHUNK_ROWS = 1000
+_SUGGESTIONS_ADAPTER = TypeAdapter(list[LLMSuggestion])
+
+# Etykiety raportu tekstowego per jezyk (wybierane raz na raport)
+_LABELS: dict[str, dict[str, str]] = {
+    "pl": {
+        "title": "RAPORT KLASTERYZACJI TEMATYCZNEJ",
+        "date": "Data",
+        "total_docs": "Liczba dokumentów",
+        "topics_found": "Wykryte kategorie",
+        "noise": "Dokumenty nieskategoryzowane",
+        "topics_header": "WYKRYTE KATEGORIE:",
+        "docs": "Dokumentow",
+        "coherence": "Koherencja",
+        "description": "Opis",
+        "keywords": "Slowa kluczowe",
+        "examples_header": "PRZYKLADY Z KAZDEJ KATEGORII:",
+        "suggestions_header": "SUGESTIE AI:",
+        "confidence": "Pewnosc",
+        "applied": "[ZASTOSOWANA]",
+        "pending": "[OCZEKUJACA]",
+    },
+    "en": {
+        "title": "TOPIC CLUSTERING REPORT",
+        "date": "Date",
+        "total_docs": "Documents",
+        "topics_found": "Topics found",
+        "noise": "Noise",
+        "topics_header": "DISCOVERED TOPICS:",
+        "docs": "Documents",
+        "coherence": "Coherence",
+        "description": "Description",
+        "keywords": "Keywords",
+        "examples_header": "EXAMPLES FROM EACH TOPIC:",
+        "suggestions_header": "AI SUGGESTIONS:",
+        "confidence": "Confidence",
+        "applied": "[ZASTOSOWANA]",
+        "pending": "[OCZEKUJACA]",
+    },
+}
+
 
 @router.post(
     "/export",
@@ -38,31 +84,46 @@ async def export_results(req: ExportRequest):
             },
         )
 
-    topics_data = [t.model_dump(by_alias=True) for t in result.topics]
-    docs_data = [d.model_dump(by_alias=True) for d in result.documents]
-    suggestions_data = [s.model_dump(by_alias=True) for s in result.llm_suggestions]
-    pl = req.language == "pl"
+    # Modele czytane wprost (atrybuty) - zrzut do dict tylko tam, gdzie trafia do JSON-a
+    topics = result.topics
+    suggestions = result.llm_suggestions
+    now = datetime.now(timezone.utc)  # jeden odczyt zegara na eksport
+    topic_map = {t.id: t for t in topics}
+    # Koherencja w % liczona raz na topik (CSV powtarza ja w kazdym wierszu dokumentu)
+    coh_pct = {t.id: f"{round(t.coherence_score * 100)}%" for t in topics}
 
     # ===== CSV =====
     if req.format == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["id", "tekst", "kategoria", "id_kategorii", "koherencja_kategorii"])
-
-        topic_map = {t["id"]: t for t in topics_data}
-        for doc in docs_data:
-            topic = topic_map.get(doc["clusterId"])
-            writer.writerow([
-                doc["id"],
-                doc["text"],
-                topic["label"] if topic else "",
-                doc["clusterId"],
-                f"{round(topic['coherenceScore'] * 100)}%" if topic else "",
-            ])
-
-        csv_content = output.getvalue()
+
+        def rows():
+            for doc in result.documents:
+                topic = topic_map.get(doc.cluster_id)
+                yield (
+                    doc.id,
+                    doc.text,
+                    topic.label if topic else "",
+                    doc.cluster_id,
+                    coh_pct[topic.id] if topic else "",
+                )
+
+        async def csv_iter():
+            # Paczki po _CSV_CHUNK_ROWS wierszy (writerows w C) wysylane od razu - bez calego pliku w pamieci
+            yield "\ufeff".encode("utf-8")  # BOM dla Excela
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(["id", "tekst", "kategoria", "id_kategorii", "koherencja_kategorii"])
+            row_iter = rows()
+            while True:
+                writer.writerows(islice(row_iter, _CSV_CHUNK_ROWS))
+                chunk = buf.getvalue()
+                if not chunk:
+                    break
+                yield chunk.encode("utf-8")
+                buf.seek(0)
+                buf.truncate(0)
+
         return StreamingResponse(
-            io.BytesIO(csv_content.encode("utf-8-sig")),  # BOM dla Excela
+            csv_iter(),
             media_type="text/csv; charset=utf-8",
             headers={"Content-Disposition": "attachment; filename=klasteryzacja_wyniki.csv"},
         )
@@ -71,96 +132,93 @@ async def export_results(req: ExportRequest):
     if req.format == "json":
         export_data = {
             "metadata": {
-                "exportDate": datetime.now(timezone.utc).isoformat(),
+                "exportDate": now.isoformat(),
                 "totalDocuments": result.total_documents,
-                "totalTopics": len(topics_data),
+                "totalTopics": len(topics),
                 "noiseDocuments": result.noise,
                 "language": req.language,
             },
             "topics": [
                 {
-                    "id": t["id"],
-                    "label": t["label"],
-                    "description": t["description"],
-                    "documentCount": t["documentCount"],
-                    "coherenceScore": t["coherenceScore"],
-                    "keywords": t["keywords"],
-                    **({"sampleTexts": t["sampleTexts"]} if req.include_examples else {}),
+                    "id": t.id,
+                    "label": t.label,
+                    "description": t.description,
+                    "documentCount": t.document_count,
+                    "coherenceScore": t.coherence_score,
+                    "keywords": t.keywords,
+                    **({"sampleTexts": t.sample_texts} if req.include_examples else {}),
                 }
-                for t in topics_data
+                for t in topics
             ],
             "documents": [
                 {
-                    "id": d["id"],
-                    "text": d["text"],
-                    "clusterId": d["clusterId"],
-                    "clusterLabel": next(
-                        (t["label"] for t in topics_data if t["id"] == d["clusterId"]),
-                        "N/A",
-                    ),
+                    "id": d.id,
+                    "text": d.text,
+                    "clusterId": d.cluster_id,
+                    "clusterLabel": topic.label if (topic := topic_map.get(d.cluster_id)) else "N/A",
                 }
-                for d in docs_data
+                for d in result.documents
             ],
         }
 
-        if req.include_llm_insights and suggestions_data:
+        if req.include_llm_insights and suggestions:
+            applied = sum(1 for s in suggestions if s.applied)
             export_data["llmInsights"] = {
-                "appliedSuggestions": sum(1 for s in suggestions_data if s.get("applied")),
-                "pendingSuggestions": sum(1 for s in suggestions_data if not s.get("applied")),
-                "suggestions": suggestions_data,
+                "appliedSuggestions": applied,
+                "pendingSuggestions": len(suggestions) - applied,
+                # Sugestie kopiowane 1:1 - JSON prosto z pydantic-core, wklejony bez dict posrednich
+                "suggestions": orjson.Fragment(_SUGGESTIONS_ADAPTER.dump_json(suggestions, by_alias=True)),
             }
 
-        return JSONResponse(content=export_data)
+        # orjson (C) zamiast json.dumps dla calego eksportu
+        return ORJSONResponse(content=export_data)
 
     # ===== TEXT =====
-    lines: list[str] = []
-
-    lines.append("RAPORT KLASTERYZACJI TEMATYCZNEJ" if pl else "TOPIC CLUSTERING REPORT")
-    lines.append("=" * 50)
-    lines.append("")
-    lines.append(f"{'Data' if pl else 'Date'}: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}")
-    lines.append(f"{'Liczba dokumentów' if pl else 'Documents'}: {result.total_documents}")
-    lines.append(f"{'Wykryte kategorie' if pl else 'Topics found'}: {len(topics_data)}")
-    lines.append(f"{'Dokumenty nieskategoryzowane' if pl else 'Noise'}: {result.noise}")
-    lines.append("")
-    lines.append("WYKRYTE KATEGORIE:" if pl else "DISCOVERED TOPICS:")
-    lines.append("-" * 50)
-    lines.append("")
-
-    sorted_topics = sorted(topics_data, key=lambda t: t["documentCount"], reverse=True)
-    for idx, topic in enumerate(sorted_topics):
-        pct = round(topic["documentCount"] / result.total_documents * 100, 1)
-        lines.append(f"{idx + 1}. {topic['label']}")
-        lines.append(f"   {'Dokumentow' if pl else 'Documents'}: {topic['documentCount']} ({pct}%)")
-        lines.append(f"   {'Koherencja' if pl else 'Coherence'}: {round(topic['coherenceScore'] * 100)}%")
-        lines.append(f"   {'Opis' if pl else 'Description'}: {topic['description']}")
-        lines.append(f"   {'Slowa kluczowe' if pl else 'Keywords'}: {', '.join(topic['keywords'])}")
-        lines.append("")
+    # Raport pisany wprost do bufora (bez listy linii i join)
+    buf = io.StringIO()
+    w = buf.write
+    rule = "-" * 50
+
+    L = _LABELS[req.language]
+
+    w(f"{L['title']}\n{'=' * 50}\n\n")
+    w(f"{L['date']}: {now.strftime('%Y-%m-%d %H:%M UTC')}\n")
+    w(f"{L['total_docs']}: {result.total_documents}\n")
+    w(f"{L['topics_found']}: {len(topics)}\n")
+    w(f"{L['noise']}: {result.noise}\n\n")
+    w(f"{L['topics_header']}\n{rule}\n\n")
+
+    sorted_topics = sorted(topics, key=attrgetter("document_count"), reverse=True)
+    total = result.total_documents
+    for idx, topic in enumerate(sorted_topics, 1):
+        pct = round(topic.document_count / total * 100, 1)
+        w(
+            f"{idx}. {topic.label}\n"
+            f"   {L['docs']}: {topic.document_count} ({pct}%)\n"
+            f"   {L['coherence']}: {coh_pct[topic.id]}\n"
+            f"   {L['description']}: {topic.description}\n"
+            f"   {L['keywords']}: {', '.join(topic.keywords)}\n\n"
+        )
 
     if req.include_examples:
-        lines.append("PRZYKLADY Z KAZDEJ KATEGORII:" if pl else "EXAMPLES FROM EACH TOPIC:")
-        lines.append("-" * 50)
-        lines.append("")
+        w(f"{L['examples_header']}\n{rule}\n\n")
         for topic in sorted_topics:
-            lines.append(f"[{topic['label']}]")
-            for s in topic.get("sampleTexts", []):
-                lines.append(f"  - {s}")
-            lines.append("")
-
-    if req.include_llm_insights and suggestions_data:
-        lines.append("SUGESTIE AI:" if pl else "AI SUGGESTIONS:")
-        lines.append("-" * 50)
-        lines.append("")
-        for idx, s in enumerate(suggestions_data):
-            status = "[ZASTOSOWANA]" if s.get("applied") else "[OCZEKUJACA]"
-            lines.append(f"{idx + 1}. {status} {s['description']}")
-            lines.append(f"   {'Pewnosc' if pl else 'Confidence'}: {round(s['confidence'] * 100)}%")
-            lines.append("")
-
-    report_text = "\n".join(lines)
-
-    return StreamingResponse(
-        io.BytesIO(report_text.encode("utf-8")),
+            w(f"[{topic.label}]\n")
+            for s in topic.sample_texts:
+                w(f"  - {s}\n")
+            w("\n")
+
+    if req.include_llm_insights and suggestions:
+        w(f"{L['suggestions_header']}\n{rule}\n\n")
+        for idx, s in enumerate(suggestions, 1):
+            status = L["applied"] if s.applied else L["pending"]
+            w(f"{idx}. {status} {s.description}\n   {L['confidence']}: {round(s.confidence * 100)}%\n\n")
+
+    # Raport konczy sie pusta linia - bez koncowego znaku nowej linii (jak wczesniej)
+    report_text = buf.getvalue()[:-1]
+
+    return Response(
+        content=report_text.encode("utf-8"),
         media_type="text/plain; charset=utf-8",
         headers={"Content-Disposition": "attachment; filename=raport_klasteryzacji.txt"},
     )
@@ -4,7 +4,9 @@ Topic Discovery Hub - Health Router
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from datetime import datetime, timezone
 
 from fastapi import APIRouter
@@ -20,17 +22,51 @@ router = APIRouter(tags=["health"])
 APP_VERSION = "2.0.0"
 
 
+# Wynik healthchecku wspoldzielony przez ~2s - sondy liveness/readiness nie obciazaja zaleznosci
+_HEALTH_CACHE_SECONDS = 2.0
+# Limit czasu pojedynczej sondy - zawieszona zaleznosc to status "error", nie wiszacy healthcheck
+_PROBE_TIMEOUT_SECONDS = 5.0
+_health_cache: tuple[float, dict] | None = None
+_health_lock = asyncio.Lock()
+
+
 @router.get("/health", summary="Healthcheck")
 async def health_check():
+    global _health_cache
+
+    # Odswiezanie w toku -> ostatni wynik od razu, bez kolejki sond za lockiem
+    if _health_lock.locked() and _health_cache is not None:
+        return _health_cache[1]
+
+    async with _health_lock:
+        if _health_cache is not None and time.monotonic() - _health_cache[0] < _HEALTH_CACHE_SECONDS:
+            return _health_cache[1]
+
+        payload = await _collect_health()
+        _health_cache = (time.monotonic(), payload)
+        return payload
+
+
+async def _probe(awaitable) -> dict:
+    try:
+        return await asyncio.wait_for(awaitable, _PROBE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"status": "error", "error": f"timeout after {_PROBE_TIMEOUT_SECONDS:g}s"}
+
+
+async def _collect_health() -> dict:
     encoder = EncoderService.get_instance()
-    clustering = ClusteringService()
-    llm = LLMService()
+    clustering = ClusteringService.get_instance()
+    llm = LLMService.get_instance()
     jobs = JobQueueService.get_instance()
 
-    encoder_health = encoder.health_check()
+    # Niezalezne sondy rownolegle; testowy encode (CPU/GPU) w watku, poza event loopem
+    encoder_health, llm_health, redis_health = await asyncio.gather(
+        _probe(asyncio.to_thread(encoder.health_check)),
+        _probe(llm.health_check()),
+        _probe(jobs.health_check()),
+    )
     clustering_health = clustering.health_check()
-    llm_health = await llm.health_check()
-    redis_health = await jobs.health_check()
 
     components = {
         "encoder": encoder_health,
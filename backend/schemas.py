@@ -4,7 +4,7 @@ Zsynchronizowane z frontendem (lib/clustering-types.ts)
 """
 
 from __future__ import annotations
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Literal
 
 
@@ -15,6 +15,15 @@ DimReductionMethod = Literal["umap", "pca", "tsne", "none"]
 JobStatus = Literal["queued", "embedding", "reducing", "clustering", "labeling", "completed", "failed"]
 
 
+# ===== Baza dla responsow =====
+
+
+class FastModel(BaseModel):
+    """Baza modeli odpowiedzi: schemat budowany leniwie (przy pierwszym uzyciu), nie przy imporcie."""
+
+    model_config = ConfigDict(defer_build=True)
+
+
 # ===== Config =====
 
 
@@ -31,7 +40,7 @@ class ClusteringConfig(BaseModel):
     encoder_model: str | None = Field(default=None, alias="encoderModel")
     encoder_prefix: str | None = Field(default=None, alias="encoderPrefix")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 # ===== Typy bazowe =====
@@ -44,7 +53,7 @@ class DocumentItem(BaseModel):
     x: float
     y: float
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class ClusterTopic(BaseModel):
@@ -59,7 +68,7 @@ class ClusterTopic(BaseModel):
     coherence_score: float = Field(alias="coherenceScore")
     keywords: list[str]
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class LLMSuggestion(BaseModel):
@@ -71,7 +80,7 @@ class LLMSuggestion(BaseModel):
     applied: bool = False
     blocked: bool = Field(default=False, description="True if suggestion conflicts with an applied suggestion")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class ClusterLabelResponse(BaseModel):
@@ -81,6 +90,20 @@ class ClusterLabelResponse(BaseModel):
     description: str = Field(description="One-sentence description of the cluster category")
 
 
+class BatchClusterLabel(BaseModel):
+    """Single cluster label within a batch labeling response."""
+
+    cluster_id: int = Field(description="ID of the labeled cluster (copied from the prompt)")
+    label: str = Field(description="Short descriptive label (max 5 words, in Polish)")
+    description: str = Field(description="One-sentence description of the cluster category")
+
+
+class BatchClusterLabelResponse(BaseModel):
+    """Response model for labeling several clusters in one request."""
+
+    labels: list[BatchClusterLabel] = Field(description="One entry per cluster from the prompt")
+
+
 class RefinementSuggestionsResponse(BaseModel):
     """Response model for refinement suggestions from LLM."""
 
@@ -96,7 +119,7 @@ class ClusteringResult(BaseModel):
     noise: int
     job_id: str | None = Field(None, alias="jobId")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 # ===== Job =====
@@ -113,7 +136,7 @@ class JobInfo(BaseModel):
     text_count: int = Field(alias="textCount")
     error: str | None = None
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 # ===== Requesty =====
@@ -131,7 +154,7 @@ class ReclusterRequest(BaseModel):
     job_id: str = Field(alias="jobId")
     config: ClusteringConfig
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class RefineRequest(BaseModel):
@@ -140,7 +163,7 @@ class RefineRequest(BaseModel):
     previous_suggestions: list[LLMSuggestion] = Field(default_factory=list, alias="previousSuggestions")
     focus_areas: list[str] = Field(default=["coherence", "granularity", "naming"], alias="focusAreas")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class RenameRequest(BaseModel):
@@ -148,17 +171,18 @@ class RenameRequest(BaseModel):
     new_label: str = Field(alias="newLabel")
     job_id: str | None = Field(None, alias="jobId")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class MergeRequest(BaseModel):
     cluster_ids: list[int] = Field(alias="clusterIds")
     new_label: str = Field(alias="newLabel")
-    documents: list[DocumentItem]
-    topics: list[ClusterTopic]
+    # Pominiete (None) przy podanym jobId -> wynik joba z Redis, bez przesylania i walidacji list
+    documents: list[DocumentItem] | None = None
+    topics: list[ClusterTopic] | None = None
     job_id: str | None = Field(None, alias="jobId")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class ReclassifyRequest(BaseModel):
@@ -166,12 +190,12 @@ class ReclassifyRequest(BaseModel):
         alias="fromClusterIds", description="List of source cluster IDs to reclassify (must be > 1)"
     )
     num_clusters: int = Field(alias="numClusters", description="Desired number of new clusters")
-    documents: list[DocumentItem]
-    topics: list[ClusterTopic]
+    documents: list[DocumentItem] | None = None
+    topics: list[ClusterTopic] | None = None
     job_id: str | None = Field(None, alias="jobId")
     generate_labels: bool = Field(True, alias="generateLabels", description="If True, generate topic labels with LLM")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class ExportRequest(BaseModel):
@@ -181,13 +205,13 @@ class ExportRequest(BaseModel):
     include_examples: bool = Field(default=True, alias="includeExamples")
     include_llm_insights: bool = Field(default=True, alias="includeLLMInsights")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 # ===== Responsy =====
 
 
-class PipelineMeta(BaseModel):
+class PipelineMeta(FastModel):
     pipeline_duration_ms: int = Field(alias="pipelineDurationMs")
     encoder_model: str = Field(alias="encoderModel")
     algorithm: str
@@ -199,44 +223,44 @@ class PipelineMeta(BaseModel):
     used_cached_embeddings: bool = Field(default=False, alias="usedCachedEmbeddings")
     completed_at: str | None = Field(default=None, alias="completedAt")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class ClusterResponse(ClusteringResult):
     meta: PipelineMeta
 
 
-class RefineAnalysis(BaseModel):
+class RefineAnalysis(FastModel):
     overall_coherence: float = Field(alias="overallCoherence")
     problematic_clusters: list[int] = Field(alias="problematicClusters")
     suggested_optimal_k: int = Field(alias="suggestedOptimalK")
     focus_areas_analyzed: list[str] = Field(alias="focusAreasAnalyzed")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
-class RefineResponse(BaseModel):
+class RefineResponse(FastModel):
     suggestions: list[LLMSuggestion]
     analysis: RefineAnalysis
 
 
-class RenameResponse(BaseModel):
+class RenameResponse(FastModel):
     topic_id: int = Field(alias="topicId")
     old_label: str = Field(alias="oldLabel")
     new_label: str = Field(alias="newLabel")
     updated: bool
     timestamp: str
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
-class ErrorDetail(BaseModel):
+class ErrorDetail(FastModel):
     code: str
     message: str
     details: dict | None = None
 
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(FastModel):
     error: ErrorDetail
 
 
@@ -246,7 +270,7 @@ class GenerateLabelsRequest(BaseModel):
     documents: list[DocumentItem]
     job_id: str | None = Field(None, alias="jobId")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class SaveCheckpointRequest(BaseModel):
@@ -254,15 +278,15 @@ class SaveCheckpointRequest(BaseModel):
     job_id: str = Field(alias="jobId")
     result: dict  # ClusteringResult as dict (documents, topics, jobId, etc.)
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
 class UndoRequest(BaseModel):
     job_id: str = Field(alias="jobId")
 
-    model_config = {"populate_by_name": True}
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
 
-class GenerateLabelsResponse(BaseModel):
+class GenerateLabelsResponse(FastModel):
     updated_topics: list[ClusterTopic] = Field(alias="updatedTopics")
     timestamp: str
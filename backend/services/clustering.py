@@ -6,24 +6,32 @@ Dim reduction for viz: UMAP 2D. Legacy: reduce_for_clustering + cluster for recl
 
 from __future__ import annotations
 
+import functools
+import importlib.util
 import logging
+import re
+import threading
 import time
+from collections import Counter, OrderedDict
 from typing import Any
 
 import numpy as np
+import scipy.sparse as sp
 import hdbscan
 import umap
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_samples
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 
 from config import (
     UMAP_N_NEIGHBORS,
     UMAP_MIN_DIST,
     UMAP_METRIC,
+    UMAP_BACKEND,
     GRANULARITY_CONFIG,
     CLUSTER_COLORS,
     POLISH_STOP_WORDS,
+    POLISH_STOP_WORDS_LIST,
 )
 
 logger = logging.getLogger(__name__)
@@ -34,18 +42,62 @@ GRANULARITY_K_MAP = {"low": 4, "medium": 7, "high": 12}
 # UMAP n_components used inside BERTopic (before clustering)
 BERTOPIC_UMAP_N_COMPONENTS = 5
 
+# faiss (opcjonalny) - szybszy KMeans w sciezce reclassify/legacy
+_FAISS_AVAILABLE = importlib.util.find_spec("faiss") is not None
 
-def _make_umap_for_bertopic(n_samples: int, seed: int = 42) -> umap.UMAP:
-    n_neighbors = min(UMAP_N_NEIGHBORS, max(2, n_samples - 1))
-    return umap.UMAP(
+# Number of memoized reduce_to_2d results
+COORDS_CACHE_SIZE = 4
+
+# Silhouette is O(N^2) - above this many documents it is estimated on a stratified sample
+COHERENCE_MAX_SAMPLES = 4000
+
+
+# Metryki obslugiwane przez cuML UMAP; przy innych zostajemy na umap-learn
+_CUML_UMAP_METRICS = frozenset({
+    "euclidean", "l2", "sqeuclidean", "cosine", "correlation", "manhattan", "l1", "cityblock",
+    "chebyshev", "linf", "minkowski", "canberra", "hellinger", "hamming", "jaccard",
+})
+
+
+@functools.cache
+def _umap_backend() -> type:
+    """
+    Klasa UMAP wg UMAP_BACKEND - cuML (GPU) albo umap-learn (CPU); rozwiazywane raz na proces.
+    cuML przyjmuje i zwraca numpy (output_type="input"), parametry konstruktora te same.
+    """
+    if UMAP_BACKEND == "cpu" or (UMAP_BACKEND == "auto" and importlib.util.find_spec("cuml") is None):
+        return umap.UMAP
+    if UMAP_METRIC not in _CUML_UMAP_METRICS:
+        logger.warning(f"UMAP metric {UMAP_METRIC!r} not supported by cuML, using umap-learn")
+        return umap.UMAP
+    try:
+        import cupy
+        from cuml.manifold import UMAP as CumlUMAP
+
+        if cupy.cuda.runtime.getDeviceCount() < 1:
+            raise RuntimeError("no CUDA device")
+    except Exception as e:
+        logger.warning(f"cuML UMAP unavailable ({e}), using umap-learn")
+        return umap.UMAP
+    logger.info("UMAP backend: cuML (GPU)")
+    return CumlUMAP
+
+
+def _make_umap(n_samples: int, n_components: int, seed: int = 42) -> Any:
+    n_neighbors = min(UMAP_N_NEIGHBORS, max(2, n_samples - 1))  # UMAP requires n_neighbors >= 2
+    return _umap_backend()(
         n_neighbors=n_neighbors,
         min_dist=UMAP_MIN_DIST,
-        n_components=BERTOPIC_UMAP_N_COMPONENTS,
+        n_components=n_components,
         metric=UMAP_METRIC,
         random_state=seed,
     )
 
 
+def _make_umap_for_bertopic(n_samples: int, seed: int = 42) -> Any:
+    return _make_umap(n_samples, BERTOPIC_UMAP_N_COMPONENTS, seed=seed)
+
+
 def _make_hdbscan_for_bertopic(
     granularity: str,
     min_cluster_size: int,
@@ -61,12 +113,58 @@ def _make_hdbscan_for_bertopic(
     )
 
 
+# Slowa >= 3 znakow (fallback slow kluczowych) - wzorzec kompilowany raz
+_WORD_RE = re.compile(r"\b\w{3,}\b")
+
+
+def _count_keywords(text: str, n: int) -> list[str]:
+    """Najczestsze slowa bez stop words (zbior, O(1) na token) - fallback, gdy TF-IDF niedostepny."""
+    counter = Counter(w for w in _WORD_RE.findall(text.lower()) if w not in POLISH_STOP_WORDS)
+    return [word for word, _ in counter.most_common(n)]
+
+
+def _to_f32(x: np.ndarray) -> np.ndarray:
+    """Embeddingi jako ciagly float32 (bez kopii, gdy juz sa) - o polowe mniej bajtow w UMAP/HDBSCAN/KMeans."""
+    return np.ascontiguousarray(x, dtype=np.float32)
+
+
+def _group_indices(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Grupowanie indeksow po etykiecie jednym np.unique + stabilny argsort -> (cids, order, offsets).
+    Indeksy grupy k: order[offsets[k]:offsets[k + 1]] (rosnaco) - bez maski labels == cid per klaster.
+    """
+    cids, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return cids, order, offsets
+
+
+def _coord_bounds(coords_2d: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Minima i zakresy kolumn (x, y); zerowy zakres -> 1.0 (brak dzielenia przez zero)."""
+    mins = coords_2d.min(axis=0)
+    ranges = coords_2d.max(axis=0) - mins
+    return mins, np.where(ranges == 0, 1.0, ranges)
+
+
 class ClusteringService:
     """
     BERTopic-based clustering with configurable UMAP + HDBSCAN/KMeans.
     Uses precomputed embeddings from our encoder/cache.
     """
 
+    _instance: ClusteringService | None = None
+
+    def __init__(self) -> None:
+        # LRU wynikow reduce_to_2d (N x 2, tanie w pamieci)
+        self._coords_cache: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._coords_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> ClusteringService:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
     # ---- BERTopic (main path) ----
 
     def fit_bertopic(
@@ -84,6 +182,7 @@ class ClusteringService:
         """
         from bertopic import BERTopic
 
+        embeddings = _to_f32(embeddings)
         n_samples = len(embeddings)
         if n_samples != len(texts):
             raise ValueError("len(texts) must equal len(embeddings)")
@@ -128,17 +227,22 @@ class ClusteringService:
         # Fallback when HDBSCAN returns no clusters
         if algorithm == "hdbscan" and n_found == 0:
             logger.warning("BERTopic HDBSCAN: 0 clusters, retrying with smaller min_cluster_size")
+            from bertopic.dimensionality import BaseDimensionalityReduction
+
+            # UMAP juz dopasowany - ponowne uzycie jego embeddingu 5D zamiast drugiego fitu (najdrozszy krok)
+            reduced = np.nan_to_num(umap_model.embedding_)
             fallback = _make_hdbscan_for_bertopic(granularity, max(3, min_cluster_size // 3))
             topic_model = BERTopic(
                 embedding_model=None,
-                umap_model=_make_umap_for_bertopic(n_samples, seed=seed),
+                umap_model=BaseDimensionalityReduction(),
                 hdbscan_model=fallback,
                 top_n_words=10,
                 min_topic_size=1,
                 verbose=False,
                 calculate_probabilities=True,
             )
-            topics_list, probs = topic_model.fit_transform(texts, embeddings=embeddings)
+            topics_list, probs = topic_model.fit_transform(texts, embeddings=reduced)
+            topic_model.umap_model = umap_model
             labels = np.array(topics_list, dtype=np.int64)
             if probs is None:
                 probs = np.ones(len(labels), dtype=np.float64)
@@ -155,20 +259,33 @@ class ClusteringService:
         self,
         embeddings: np.ndarray,
         seed: int = 42,
+        cache_key: str | None = None,
     ) -> np.ndarray:
-        """Reduce to 2D for scatter plot (UMAP)."""
+        """
+        Reduce to 2D for scatter plot (UMAP).
+        cache_key (np. job_id, gdy embeddingi joba sa niezmienne) wlacza zapamietanie wyniku per (klucz, seed).
+        """
+        embeddings = _to_f32(embeddings)
+        key = None
+        if cache_key is not None:
+            key = (cache_key, seed, embeddings.shape, UMAP_N_NEIGHBORS, UMAP_MIN_DIST, UMAP_METRIC)
+            with self._coords_lock:
+                cached = self._coords_cache.get(key)
+                if cached is not None:
+                    self._coords_cache.move_to_end(key)
+                    logger.info("Viz reduction: cache hit")
+                    return cached.copy()
+
         logger.info(f"Viz reduction: {embeddings.shape[1]}D -> 2D via UMAP")
         start = time.time()
-        n_neighbors = min(UMAP_N_NEIGHBORS, max(2, len(embeddings) - 1))  # UMAP requires n_neighbors >= 2
-        reducer = umap.UMAP(
-            n_neighbors=n_neighbors,
-            min_dist=UMAP_MIN_DIST,
-            n_components=2,
-            metric=UMAP_METRIC,
-            random_state=seed,
-        )
+        reducer = _make_umap(len(embeddings), 2, seed=seed)
         coords_2d = reducer.fit_transform(embeddings)
         logger.info(f"Viz reduction done in {time.time() - start:.1f}s")
+        if key is not None:
+            with self._coords_lock:
+                self._coords_cache[key] = coords_2d.copy()
+                while len(self._coords_cache) > COORDS_CACHE_SIZE:
+                    self._coords_cache.popitem(last=False)
         return coords_2d
 
     # ---- Legacy: pre-clustering reduction and raw cluster (for reclassify / compatibility) ----
@@ -181,6 +298,7 @@ class ClusteringService:
         seed: int = 42,
     ) -> np.ndarray:
         """Reduce dims before clustering (used only when not using BERTopic)."""
+        embeddings = _to_f32(embeddings)
         if method == "none" or target_dims >= embeddings.shape[1]:
             return embeddings
         from sklearn.decomposition import PCA
@@ -198,15 +316,31 @@ class ClusteringService:
             perplexity = min(30, max(1, n_s - 1))
             reducer = TSNE(n_components=min(target_dims, 3), random_state=seed, perplexity=perplexity)
             return reducer.fit_transform(embeddings)
-        reducer = umap.UMAP(
-            n_neighbors=min(UMAP_N_NEIGHBORS, max(2, len(embeddings) - 1)),
-            min_dist=UMAP_MIN_DIST,
-            n_components=target_dims,
-            metric=UMAP_METRIC,
-            random_state=seed,
-        )
+        reducer = _make_umap(len(embeddings), target_dims, seed=seed)
         return reducer.fit_transform(embeddings)
 
+    def fit_kmeans(
+        self,
+        embeddings: np.ndarray,
+        n_clusters: int,
+        seed: int = 42,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        KMeans -> (etykiety, odleglosc do najblizszego centroidu).
+        faiss (wielowatkowy GEMM) gdy zainstalowany, inaczej sklearn.
+        """
+        embeddings = _to_f32(embeddings)
+        if _FAISS_AVAILABLE:
+            import faiss
+
+            km = faiss.Kmeans(embeddings.shape[1], n_clusters, niter=20, nredo=3, seed=seed, verbose=False)
+            km.train(embeddings)
+            sq_dist, idx = km.index.search(embeddings, 1)
+            return idx.ravel().astype(np.int64), np.sqrt(np.maximum(sq_dist.ravel(), 0.0))
+        model = KMeans(n_clusters=n_clusters, random_state=seed, n_init=10)
+        labels = model.fit_predict(embeddings)
+        return labels, model.transform(embeddings).min(axis=1)
+
     def cluster(
         self,
         embeddings: np.ndarray,
@@ -216,14 +350,12 @@ class ClusteringService:
         min_cluster_size: int = 5,
     ) -> tuple[np.ndarray, np.ndarray]:
         """Legacy: cluster on reduced embeddings (e.g. reclassify uses KMeans on raw embeddings)."""
+        embeddings = _to_f32(embeddings)
         if algorithm == "kmeans":
             k = num_clusters or GRANULARITY_K_MAP[granularity]
             n_s = len(embeddings)
             k = max(1, min(k, n_s - 1))  # 1 <= k; k < n_s avoids degenerate singleton clusters
-            model = KMeans(n_clusters=k, random_state=42, n_init=10)
-            labels = model.fit_predict(embeddings)
-            distances = model.transform(embeddings)
-            min_dist = distances.min(axis=1)
+            labels, min_dist = self.fit_kmeans(embeddings, k)
             max_d = min_dist.max() if min_dist.max() > 0 else 1.0
             probabilities = 1.0 - (min_dist / max_d)
             return labels, probabilities
@@ -261,25 +393,41 @@ class ClusteringService:
         embeddings: np.ndarray,
         labels: np.ndarray,
     ) -> dict[int, float]:
-        mask = labels != -1
-        if mask.sum() < 2:
+        embeddings = _to_f32(embeddings)
+        idx = np.flatnonzero(labels != -1)
+        if idx.size < 2:
             return {}
-        unique_labels = set(labels[mask])
+        unique_labels = np.unique(labels[idx]).tolist()
         if len(unique_labels) < 2:
             return {lbl: 0.75 for lbl in unique_labels}
+        if idx.size > COHERENCE_MAX_SAMPLES:
+            idx = self._stratified_sample(labels, idx, COHERENCE_MAX_SAMPLES)
+        label_array = labels[idx]
         try:
-            scores = silhouette_samples(embeddings[mask], labels[mask], metric="cosine")
+            scores = silhouette_samples(embeddings[idx], label_array, metric="cosine")
         except Exception as e:
             logger.warning(f"Silhouette error: {e}")
             return {lbl: 0.5 for lbl in unique_labels}
+        # Srednia per klaster jednym przejsciem (bincount) zamiast maski per klaster
+        cids, inverse = np.unique(label_array, return_inverse=True)
+        means = np.bincount(inverse, weights=scores) / np.bincount(inverse)
         coherence: dict[int, float] = {}
-        label_array = labels[mask]
-        for cid in unique_labels:
-            cmask = label_array == cid
-            raw = float(scores[cmask].mean())
+        for cid, raw in zip(cids.tolist(), means.tolist()):
             coherence[cid] = max(0.0, min(1.0, (raw + 1.0) / 2.0))
         return coherence
 
+    @staticmethod
+    def _stratified_sample(labels: np.ndarray, idx: np.ndarray, size: int) -> np.ndarray:
+        """Proporcjonalna probka indeksow per klaster (min. 10 na klaster); stale ziarno - powtarzalny wynik."""
+        rng = np.random.default_rng(42)
+        _, order, offsets = _group_indices(labels[idx])
+        parts = []
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+            members = idx[order[start:end]]
+            k = min(members.size, max(10, round(size * members.size / idx.size)))
+            parts.append(rng.choice(members, size=k, replace=False))
+        return np.sort(np.concatenate(parts))
+
     # ---- Keywords and samples (fallback when no BERTopic) ----
 
     def extract_keywords(self, texts_in_cluster: list[str], n: int = 7) -> list[str]:
@@ -287,13 +435,7 @@ class ClusteringService:
             return []
         if len(texts_in_cluster) == 1:
             try:
-                from collections import Counter
-                import re
-                text = texts_in_cluster[0].lower()
-                words = re.findall(r"\b\w+\b", text)
-                filtered = [w for w in words if w not in POLISH_STOP_WORDS and len(w) > 2]
-                counter = Counter(filtered)
-                return [word for word, _ in counter.most_common(n)]
+                return _count_keywords(texts_in_cluster[0], n)
             except Exception as e:
                 logger.warning(f"Simple keyword extraction error: {e}")
                 return []
@@ -304,7 +446,7 @@ class ClusteringService:
                 max_df = min_df
             vec = TfidfVectorizer(
                 max_features=500,
-                stop_words=POLISH_STOP_WORDS,
+                stop_words=POLISH_STOP_WORDS_LIST,
                 min_df=min_df,
                 max_df=max_df,
                 ngram_range=(1, 2),
@@ -317,17 +459,93 @@ class ClusteringService:
         except Exception as e:
             logger.warning(f"TF-IDF error: {e}")
             try:
-                from collections import Counter
-                import re
-                all_text = " ".join(texts_in_cluster).lower()
-                words = re.findall(r"\b\w+\b", all_text)
-                filtered = [w for w in words if w not in POLISH_STOP_WORDS and len(w) > 2]
-                counter = Counter(filtered)
-                return [word for word, _ in counter.most_common(n)]
+                return _count_keywords(" ".join(texts_in_cluster), n)
             except Exception as e2:
                 logger.warning(f"Fallback keyword extraction error: {e2}")
                 return []
 
+    def _fit_corpus_tfidf(self, texts: list[str]) -> tuple:
+        """TF-IDF dopasowany raz na wszystkich tekstach -> (macierz CSR, nazwy termow); () przy bledzie."""
+        try:
+            vec = TfidfVectorizer(
+                max_features=2000,
+                stop_words=POLISH_STOP_WORDS_LIST,
+                ngram_range=(1, 2),
+                sublinear_tf=True,
+            )
+            tfidf = vec.fit_transform(texts).tocsr()
+            return tfidf, vec.get_feature_names_out()
+        except Exception as e:
+            logger.warning(f"Corpus TF-IDF error: {e}")
+            return ()
+
+    def extract_keywords_from_indices(
+        self,
+        tfidf: sp.csr_matrix,
+        names: np.ndarray,
+        indices: np.ndarray,
+        n: int = 7,
+    ) -> list[str]:
+        """Top-n termow klastra: suma wierszy korpusowej macierzy TF-IDF + argpartition zamiast pelnego sortu."""
+        scores = np.asarray(tfidf[indices].sum(axis=0)).ravel()
+        k = min(n, scores.size)
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [names[i] for i in top if scores[i] > 0]
+
+    def extract_keywords_grouped(
+        self,
+        texts: list[str],
+        labels: list[int],
+        n: int = 7,
+    ) -> dict[int, list[str]]:
+        """
+        Slowa kluczowe dla wielu klastrow naraz (c-TF-IDF, jak w BERTopic).
+        Jeden CountVectorizer na wszystkich tekstach; czestosci sumowane per klaster
+        macierza rzadka, waga termu: tf_klastra * log(1 + srednia_slow_na_klaster / tf_globalne).
+        IDF zalezy od podanego podzialu - wolajacy przekazuje wszystkie klastry joba.
+        """
+        groups = list(dict.fromkeys(labels))
+        if not groups:
+            return {}
+        try:
+            vec = CountVectorizer(stop_words=POLISH_STOP_WORDS_LIST, ngram_range=(1, 2))
+            counts = vec.fit_transform(texts)
+
+            # Macierz przynaleznosci (klaster x dokument) -> czestosci termow per klaster (rzadko, bez toarray)
+            group_idx = {g: i for i, g in enumerate(groups)}
+            rows = np.fromiter((group_idx[label] for label in labels), dtype=np.int64, count=len(labels))
+            membership = sp.csr_matrix(
+                (np.ones(len(labels), dtype=np.float64), (rows, np.arange(len(labels)))),
+                shape=(len(groups), len(labels)),
+            )
+            tf = (membership @ counts).tocsr()
+
+            term_totals = np.asarray(tf.sum(axis=0)).ravel()
+            avg_words = tf.sum() / len(groups)
+            idf = np.log1p(avg_words / np.maximum(term_totals, 1))
+            row_sums = np.maximum(np.asarray(tf.sum(axis=1)).ravel(), 1)
+            scores = (sp.diags(1.0 / row_sums) @ tf @ sp.diags(idf)).tocsr()
+
+            names = vec.get_feature_names_out()
+            result: dict[int, list[str]] = {}
+            for g, start, end in zip(groups, scores.indptr[:-1], scores.indptr[1:]):
+                cols, vals = scores.indices[start:end], scores.data[start:end]
+                if len(vals) > n:
+                    part = np.argpartition(vals, -n)[-n:]
+                    cols, vals = cols[part], vals[part]
+                order = np.argsort(-vals, kind="stable")
+                result[g] = [names[cols[k]] for k in order if vals[k] > 0]
+            return result
+        except Exception as e:
+            logger.warning(f"c-TF-IDF error: {e}")
+            by_group: dict[int, list[str]] = {g: [] for g in groups}
+            for text, label in zip(texts, labels):
+                by_group[label].append(text)
+            return {g: self.extract_keywords(group_texts, n) for g, group_texts in by_group.items()}
+
     def get_representative_samples(
         self,
         embeddings: np.ndarray,
@@ -335,15 +553,26 @@ class ClusteringService:
         texts: list[str],
         cluster_id: int,
         n: int = 5,
+        indices: np.ndarray | None = None,
+        row_norms: np.ndarray | None = None,
     ) -> list[str]:
-        mask = labels == cluster_id
-        indices = np.where(mask)[0]
+        """
+        Teksty najblizsze centroidowi klastra (cosinus: jeden GEMV + argpartition).
+        indices/row_norms mozna podac z gory (build_topics) - bez maski po labels i normy per wywolanie.
+        """
+        embeddings = _to_f32(embeddings)
+        if indices is None:
+            indices = np.flatnonzero(labels == cluster_id)
         if len(indices) == 0:
             return []
         cluster_emb = embeddings[indices]
+        norms = row_norms[indices] if row_norms is not None else np.linalg.norm(cluster_emb, axis=1)
         centroid = cluster_emb.mean(axis=0)
-        dists = np.linalg.norm(cluster_emb - centroid, axis=1)
-        top = dists.argsort()[:n]
+        centroid /= np.linalg.norm(centroid) + 1e-12
+        sims = (cluster_emb @ centroid) / (norms + 1e-12)
+        k = min(n, sims.size)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
         return [texts[indices[i]] for i in top]
 
     # ---- Build output for API ----
@@ -357,19 +586,25 @@ class ClusteringService:
         coherence_scores: dict[int, float],
         topic_model: Any = None,
     ) -> list[dict]:
-        x_min, x_max = coords_2d[:, 0].min(), coords_2d[:, 0].max()
-        y_min, y_max = coords_2d[:, 1].min(), coords_2d[:, 1].max()
-        x_range = x_max - x_min if x_max != x_min else 1.0
-        y_range = y_max - y_min if y_max != y_min else 1.0
-
-        unique = sorted(set(labels))
+        embeddings = _to_f32(embeddings)
+        (x_min, y_min), (x_range, y_range) = _coord_bounds(coords_2d)
+
+        # Jedno przejscie po danych: indeksy pogrupowane per klaster (_group_indices),
+        # licznosci z offsetow, sumy wspolrzednych jednym reduceat po ciaglych blokach
+        labels = np.asarray(labels)
+        cids, order, offsets = _group_indices(labels)
+        counts = np.diff(offsets)
+        sums = np.add.reduceat(np.asarray(coords_2d, dtype=np.float64)[order], offsets[:-1], axis=0)
+
+        # Normy wierszy embeddingow liczone raz (leniwie) - wspolne dla probek wszystkich klastrow
+        row_norms = functools.cache(lambda: np.linalg.norm(embeddings, axis=1))
+        # Bez topic_model: jedna macierz TF-IDF na calym korpusie (leniwie), slowa kluczowe z wierszy klastra
+        corpus_tfidf: tuple | None = None
         topics = []
-        for cid in unique:
-            if cid == -1:
+        for k, cid in enumerate(cids.tolist()):
+            if cid < 0:
                 continue
-            mask = labels == cid
-            indices = np.where(mask)[0]
-            cluster_coords = coords_2d[indices]
+            indices = order[offsets[k]:offsets[k + 1]]
             cluster_texts = [texts[i] for i in indices]
 
             if topic_model is not None:
@@ -383,30 +618,34 @@ class ClusteringService:
                     samples = list(repr_docs.get(int(cid), []))[:5]
                     if not samples:
                         samples = self.get_representative_samples(
-                            embeddings, labels, texts, cid, n=5
+                            embeddings, labels, texts, cid, n=5, indices=indices, row_norms=row_norms()
                         )
                 except Exception:
                     samples = self.get_representative_samples(
-                        embeddings, labels, texts, cid, n=5
+                        embeddings, labels, texts, cid, n=5, indices=indices, row_norms=row_norms()
                     )
             else:
-                keywords = self.extract_keywords(cluster_texts)
+                if corpus_tfidf is None:
+                    corpus_tfidf = self._fit_corpus_tfidf(texts)
+                if corpus_tfidf:
+                    keywords = self.extract_keywords_from_indices(*corpus_tfidf, indices)
+                else:
+                    keywords = self.extract_keywords(cluster_texts)
                 samples = self.get_representative_samples(
-                    embeddings, labels, texts, cid, n=5
+                    embeddings, labels, texts, cid, n=5, indices=indices, row_norms=row_norms()
                 )
 
             coherence = coherence_scores.get(cid, 0.5)
-            centroid_x_raw = cluster_coords[:, 0].mean()
-            centroid_y_raw = cluster_coords[:, 1].mean()
-            centroid_x_norm = 5 + 90 * (centroid_x_raw - x_min) / x_range
-            centroid_y_norm = 5 + 90 * (centroid_y_raw - y_min) / y_range
+            size = int(counts[k])
+            centroid_x_norm = 5 + 90 * (sums[k, 0] / size - x_min) / x_range
+            centroid_y_norm = 5 + 90 * (sums[k, 1] / size - y_min) / y_range
 
             topics.append(
                 {
                     "id": int(cid),
                     "label": f"Klaster {cid}",
                     "description": "",
-                    "documentCount": int(mask.sum()),
+                    "documentCount": size,
                     "sampleTexts": samples,
                     "color": CLUSTER_COLORS[cid % len(CLUSTER_COLORS)],
                     "centroidX": round(float(centroid_x_norm), 2),
@@ -423,24 +662,23 @@ class ClusteringService:
         labels: np.ndarray,
         coords_2d: np.ndarray,
     ) -> list[dict]:
-        x_min, x_max = coords_2d[:, 0].min(), coords_2d[:, 0].max()
-        y_min, y_max = coords_2d[:, 1].min(), coords_2d[:, 1].max()
-        x_range = x_max - x_min if x_max != x_min else 1.0
-        y_range = y_max - y_min if y_max != y_min else 1.0
-        documents = []
-        for i, text in enumerate(texts):
-            x_norm = 5 + 90 * (coords_2d[i, 0] - x_min) / x_range
-            y_norm = 5 + 90 * (coords_2d[i, 1] - y_min) / y_range
-            documents.append(
-                {
-                    "id": f"doc-{i}",
-                    "text": text,
-                    "clusterId": int(labels[i]),
-                    "x": round(float(x_norm), 2),
-                    "y": round(float(y_norm), 2),
-                }
-            )
-        return documents
+        # Normalizacja do [5, 95] jedna operacja na calej tablicy; do Pythona tylko gotowe listy
+        coords = np.asarray(coords_2d, dtype=np.float64)
+        mins, ranges = _coord_bounds(coords)
+        norm = np.round(5 + 90 * (coords - mins) / ranges, 2)
+        xs = norm[:, 0].tolist()
+        ys = norm[:, 1].tolist()
+        cluster_ids = np.asarray(labels).astype(int).tolist()
+        return [
+            {
+                "id": f"doc-{i}",
+                "text": text,
+                "clusterId": cid,
+                "x": x,
+                "y": y,
+            }
+            for i, (text, cid, x, y) in enumerate(zip(texts, cluster_ids, xs, ys))
+        ]
 
     def health_check(self) -> dict:
         try:
@@ -448,7 +686,11 @@ class ClusteringService:
             import hdbscan as h
             import bertopic as bt
             return {
-                "umap": {"status": "up", "version": u.__version__},
+                "umap": {
+                    "status": "up",
+                    "version": u.__version__,
+                    "backend": "cuml" if _umap_backend() is not u.UMAP else "umap-learn",
+                },
                 "hdbscan": {"status": "up", "version": h.__version__},
                 "bertopic": {"status": "up", "version": getattr(bt, "__version__", "?")},
             }
@@ -7,21 +7,23 @@ Dla każdego modelu do embeddowania trafi: prefix + tekst (jeśli prefix podany)
 from __future__ import annotations
 
 import logging
+import threading
 import time
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Any
 
 import numpy as np
-import torch
-from transformers import AutoTokenizer, AutoModel
 
+# torch/transformers importowane leniwie (load/encode) - import modulu, routerow i main nie placi zimnego startu torcha
 if TYPE_CHECKING:
-    pass
+    import torch
 
 from config import (
-    ENCODER_BATCH_SIZE,
     ENCODER_MAX_SEQ_LENGTH,
-    ENCODER_DEVICE,
+    ENCODER_MODEL_CACHE_SIZE,
     ENCODER_MODELS,
+    resolve_encoder_batch_size,
+    resolve_encoder_device,
 )
 
 logger = logging.getLogger(__name__)
@@ -39,11 +41,13 @@ class EncoderService:
     def __init__(self) -> None:
         self.encoder_configs = ENCODER_MODELS
         self.model_name = ", ".join(c["model"] for c in self.encoder_configs)
-        self.batch_size = ENCODER_BATCH_SIZE
+        self.batch_size = resolve_encoder_batch_size()
         self.max_seq_length = ENCODER_MAX_SEQ_LENGTH
         self._loaded_models: list[dict[str, Any]] = []
         self._loaded = False
-        self._model_cache: dict[str, dict[str, Any]] = {}
+        # LRU modeli ladowanych na zyczenie; lock - encode dziala w watkach roboczych
+        self._model_cache: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._model_cache_lock = threading.Lock()
 
     @classmethod
     def get_instance(cls) -> EncoderService:
@@ -52,17 +56,24 @@ class EncoderService:
         return cls._instance
 
     def _get_device(self) -> torch.device:
-        if ENCODER_DEVICE == "auto":
-            return torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        return torch.device(ENCODER_DEVICE)
+        import torch
+
+        return torch.device(resolve_encoder_device()[0])
+
+    def _get_dtype(self) -> torch.dtype:
+        import torch
+
+        return getattr(torch, resolve_encoder_device()[1])
 
     def load(self) -> None:
         """Ładuje wszystkie modele z listy. Wywoływane przy starcie lub przy pierwszym encode()."""
         if self._loaded:
             return
+        from transformers import AutoModel, AutoTokenizer
 
         device = self._get_device()
-        logger.info(f"Urządzenie: {device}")
+        dtype = self._get_dtype()
+        logger.info(f"Urządzenie: {device} ({dtype}), batch size: {self.batch_size}")
 
         for cfg in self.encoder_configs:
             name = cfg["model"]
@@ -70,7 +81,7 @@ class EncoderService:
             logger.info(f"Ładowanie modelu encoder: {name}" + (f" (prefix: {prefix!r})" if prefix else ""))
             start = time.time()
             tokenizer = AutoTokenizer.from_pretrained(name)
-            model = AutoModel.from_pretrained(name)
+            model = AutoModel.from_pretrained(name, torch_dtype=dtype)
             model.to(device)
             model.eval()
             elapsed = time.time() - start
@@ -92,6 +103,8 @@ class EncoderService:
         attention_mask: torch.Tensor,
     ) -> torch.Tensor:
         """Mean pooling - uwzględnia attention mask."""
+        import torch
+
         token_embeddings = model_output.last_hidden_state
         input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
         return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
@@ -106,6 +119,8 @@ class EncoderService:
         total_models: int,
         model_index: int,
     ) -> np.ndarray:
+        import torch
+
         prefix = enc.get("prefix") or ""
         if prefix:
             sep = " " if not prefix.endswith(" ") else ""
@@ -128,11 +143,13 @@ class EncoderService:
                 return_tensors="pt",
             )
             encoded = {k: v.to(device) for k, v in encoded.items()}
-            output = model(**encoded)
-            embeddings = self._mean_pooling(output, encoded["attention_mask"])
-            if normalize:
-                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-            all_embeddings.append(embeddings.cpu().numpy())
+            with torch.no_grad():
+                output = model(**encoded)
+                embeddings = self._mean_pooling(output, encoded["attention_mask"])
+                if normalize:
+                    embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+            # fp16/bf16 -> float32 (numpy nie obsluguje bfloat16)
+            all_embeddings.append(embeddings.float().cpu().numpy())
             if progress_callback:
                 try:
                     processed = min(i + bs, n_texts)
@@ -146,7 +163,6 @@ class EncoderService:
                     logger.warning(f"Progress callback error: {e}")
         return np.vstack(all_embeddings)
 
-    @torch.no_grad()
     def encode(
         self,
         texts: list[str],
@@ -183,26 +199,37 @@ class EncoderService:
         return result
 
     def _ensure_model_loaded(self, model_name: str) -> dict[str, Any]:
-        """Load a single model by name (cached). Returns enc dict for _encode_single."""
-        if model_name in self._model_cache:
-            return self._model_cache[model_name]
+        """Load a single model by name (LRU-cached). Returns enc dict for _encode_single."""
+        with self._model_cache_lock:
+            enc = self._model_cache.get(model_name)
+            if enc is not None:
+                self._model_cache.move_to_end(model_name)
+                return enc
+            # Ladowanie pod lockiem - rownolegle zadania o ten sam model nie laduja go dwa razy
+            enc = self._load_single_model(model_name)
+            self._model_cache[model_name] = enc
+            while len(self._model_cache) > max(1, ENCODER_MODEL_CACHE_SIZE):
+                evicted, _ = self._model_cache.popitem(last=False)
+                logger.info(f"Usunięto model z cache: {evicted}")
+            return enc
+
+    def _load_single_model(self, model_name: str) -> dict[str, Any]:
+        from transformers import AutoModel, AutoTokenizer
+
         device = self._get_device()
         logger.info(f"Ładowanie modelu encoder (na życzenie): {model_name}")
         tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModel.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name, torch_dtype=self._get_dtype())
         model.to(device)
         model.eval()
-        enc = {
+        return {
             "model_name": model_name,
             "prefix": "",
             "tokenizer": tokenizer,
             "model": model,
             "device": device,
         }
-        self._model_cache[model_name] = enc
-        return enc
 
-    @torch.no_grad()
     def encode_single_model(
         self,
         texts: list[str],
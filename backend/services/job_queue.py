@@ -10,37 +10,74 @@ Klucze Redis:
   tdh:embeddings:{job_id}       -> numpy embeddings (bytes)
   tdh:texts:{job_id}            -> teksty (JSON list)
   tdh:active_jobs               -> set of active job IDs
+  tdh:label:{digest}            -> etykieta LLM klastra (JSON, klucz z tresci)
+  tdh:kw:{digest}               -> slowa kluczowe klastra (JSON list, klucz z tresci)
+  tdh:dedup:{digest}            -> job_id dla identycznych tekstow + configu (deduplikacja submit, tylko joby w toku)
 """
 
 from __future__ import annotations
 
 import asyncio
 import io
-import json
 import logging
 import time
 import uuid
 from datetime import datetime, timezone
 
 import numpy as np
+import orjson
 import redis.asyncio as aioredis
 
 from config import (
     REDIS_URL,
     REDIS_PREFIX,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_KEY_EMBEDDINGS_PREFIX,
     EMBEDDING_CACHE_TTL,
     JOB_TTL,
     RESULT_TTL,
     MAX_CONCURRENT_JOBS,
+    LLM_LABEL_CACHE_TTL,
 )
 
 logger = logging.getLogger(__name__)
 
+_ACTIVE_JOBS_KEY: str = REDIS_PREFIX + "active_jobs"
+
+# Deduplikacja submit: okno na retry z UI / zerwane polaczenie, nie caly czas zycia joba
+_DEDUP_TTL = 10 * 60
+# Reuzywane sa tylko joby w toku - wynik zakonczonego joba moze byc juz edytowany (rename/merge/undo)
+_DEDUP_STATUSES = frozenset({"queued", "embedding", "reducing", "clustering", "labeling"})
+
+# Pola hasha joba (tdh:job:{id}) - zapisywane przez create_job/update_job/complete_job/fail_job
+_JOB_FIELDS: tuple[str, ...] = (
+    "jobId",
+    "status",
+    "progress",
+    "currentStep",
+    "createdAt",
+    "updatedAt",
+    "config",
+    "textCount",
+    "error",
+)
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Max czas oczekiwania (s) na wolne polaczenie z puli Redis
+_POOL_TIMEOUT = 20
+
+
+def _dumps(obj) -> bytes:
+    """Kompaktowy JSON (UTF-8 bytes); nieznane typy -> str, jak wczesniej default=str."""
+    return orjson.dumps(obj, default=str, option=_ORJSON_OPTIONS)
+
 
 class JobQueueService:
     """Redis-based async job queue for clustering pipeline."""
 
     _instance: JobQueueService | None = None
+    _pool: aioredis.ConnectionPool | None = None
     _redis: aioredis.Redis | None = None
 
     @classmethod
@@ -51,15 +88,54 @@ class JobQueueService:
 
     async def _get_redis(self) -> aioredis.Redis:
         if self._redis is None:
-            self._redis = aioredis.from_url(
+            # Jedna pula na proces z limitem polaczen; blokujaca - przy komplecie zajetych
+            # kolejny request czeka na zwolnienie (do _POOL_TIMEOUT s) zamiast "Too many connections"
+            self._pool = aioredis.BlockingConnectionPool.from_url(
                 REDIS_URL,
                 decode_responses=False,  # binary for numpy
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=_POOL_TIMEOUT,
             )
+            self._redis = aioredis.Redis(connection_pool=self._pool)
         return self._redis
 
     def _key(self, *parts: str) -> str:
         return REDIS_PREFIX + ":".join(parts)
 
+    # Specjalizowane klucze dla goracych sciezek (poll statusu, zapis wyniku) - bez *parts i join
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"{REDIS_PREFIX}job:{job_id}"
+
+    @staticmethod
+    def _result_key(job_id: str) -> str:
+        return f"{REDIS_PREFIX}job:{job_id}:result"
+
+    @staticmethod
+    def _undo_key(job_id: str) -> str:
+        return f"{REDIS_PREFIX}job:{job_id}:undo"
+
+    @staticmethod
+    def _texts_key(job_id: str) -> str:
+        return f"{REDIS_PREFIX}texts:{job_id}"
+
+    @staticmethod
+    def _embeddings_key(job_id: str) -> bytes:
+        return REDIS_KEY_EMBEDDINGS_PREFIX + job_id.encode()
+
+    @staticmethod
+    def _dedup_key(digest: str) -> str:
+        return f"{REDIS_PREFIX}dedup:{digest}"
+
+    @staticmethod
+    def _label_key(digest: str) -> str:
+        return f"{REDIS_PREFIX}label:{digest}"
+
+    @staticmethod
+    def _keywords_key(digest: str) -> str:
+        return f"{REDIS_PREFIX}kw:{digest}"
+
     # ---- Job lifecycle ----
 
     async def create_job(
@@ -70,8 +146,11 @@ class JobQueueService:
         """Create a new clustering job, store texts, return job_id."""
         r = await self._get_redis()
 
-        # Check concurrency limit
-        active = await r.scard(self._key("active_jobs"))
+        # Check concurrency limit; serializacja tekstow (MB) w watku, rownolegle z SCARD
+        active, texts_payload = await asyncio.gather(
+            r.scard(_ACTIVE_JOBS_KEY),
+            asyncio.to_thread(_dumps, texts),
+        )
         if active and int(active) >= MAX_CONCURRENT_JOBS:
             raise RuntimeError(
                 f"Osiagnieto limit jednoczesnych zadan ({MAX_CONCURRENT_JOBS}). "
@@ -88,31 +167,45 @@ class JobQueueService:
             "currentStep": "Oczekiwanie w kolejce...",
             "createdAt": now,
             "updatedAt": now,
-            "config": json.dumps(config),
+            "config": _dumps(config),
             "textCount": len(texts),
             "error": "",
         }
 
         pipe = r.pipeline()
-        pipe.hset(self._key("job", job_id), mapping={
-            k: str(v) if not isinstance(v, str) else v
+        pipe.hset(self._job_key(job_id), mapping={
+            k: v if isinstance(v, (str, bytes)) else str(v)
             for k, v in job_info.items()
         })
-        pipe.expire(self._key("job", job_id), JOB_TTL)
+        pipe.expire(self._job_key(job_id), JOB_TTL)
 
         # Store texts
-        pipe.set(
-            self._key("texts", job_id),
-            json.dumps(texts, ensure_ascii=False).encode("utf-8"),
-        )
-        pipe.expire(self._key("texts", job_id), JOB_TTL)
+        pipe.set(self._texts_key(job_id), texts_payload, ex=JOB_TTL)
 
-        pipe.sadd(self._key("active_jobs"), job_id)
+        pipe.sadd(_ACTIVE_JOBS_KEY, job_id)
         await pipe.execute()
 
         logger.info(f"Job {job_id} created: {len(texts)} texts, config={config}")
         return job_id
 
+    async def find_duplicate_job(self, digest: str) -> dict | None:
+        """
+        Job w toku utworzony wczesniej z tymi samymi tekstami i configiem (digest z routera).
+        Joby zakonczone (completed/failed/interrupted) nie sa reuzywane - ponowne wyslanie to nowa klasteryzacja.
+        """
+        r = await self._get_redis()
+        job_id = await r.get(self._dedup_key(digest))
+        if job_id is None:
+            return None
+        job_info = await self.get_job(job_id.decode())
+        if not job_info or job_info.get("status") not in _DEDUP_STATUSES:
+            return None
+        return job_info
+
+    async def remember_job(self, digest: str, job_id: str) -> None:
+        r = await self._get_redis()
+        await r.set(self._dedup_key(digest), job_id, ex=_DEDUP_TTL)
+
     async def update_job(
         self,
         job_id: str,
@@ -135,26 +228,25 @@ class JobQueueService:
         if error is not None:
             updates["error"] = error
 
-        await r.hset(self._key("job", job_id), mapping=updates)
+        await r.hset(self._job_key(job_id), mapping=updates)
 
     async def get_job(self, job_id: str) -> dict | None:
         """Get job info from Redis."""
         r = await self._get_redis()
-        data = await r.hgetall(self._key("job", job_id))
-        if not data:
+        values = await r.hmget(self._job_key(job_id), _JOB_FIELDS)
+        result = {
+            k: v.decode() if isinstance(v, bytes) else v
+            for k, v in zip(_JOB_FIELDS, values)
+            if v is not None
+        }
+        if not result:
             return None
 
-        result = {}
-        for k, v in data.items():
-            key = k.decode() if isinstance(k, bytes) else k
-            val = v.decode() if isinstance(v, bytes) else v
-            result[key] = val
-
         # Parse config back to dict
         if "config" in result:
             try:
-                result["config"] = json.loads(result["config"])
-            except json.JSONDecodeError:
+                result["config"] = orjson.loads(result["config"])
+            except orjson.JSONDecodeError:
                 result["config"] = {}
 
         # Parse numeric fields
@@ -168,20 +260,18 @@ class JobQueueService:
     async def complete_job(self, job_id: str, result: dict) -> None:
         """Mark job complete, store result, remove from active set."""
         r = await self._get_redis()
+        # Wynik (dokumenty + topiki) serializowany poza petla zdarzen
+        payload = await asyncio.to_thread(_dumps, result)
 
         pipe = r.pipeline()
-        pipe.hset(self._key("job", job_id), mapping={
+        pipe.hset(self._job_key(job_id), mapping={
             "status": "completed",
             "progress": "100",
             "currentStep": "Zakonczono",
             "updatedAt": datetime.now(timezone.utc).isoformat(),
         })
-        pipe.set(
-            self._key("job", job_id, "result"),
-            json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"),
-        )
-        pipe.expire(self._key("job", job_id, "result"), RESULT_TTL)
-        pipe.srem(self._key("active_jobs"), job_id)
+        pipe.set(self._result_key(job_id), payload, ex=RESULT_TTL)
+        pipe.srem(_ACTIVE_JOBS_KEY, job_id)
         await pipe.execute()
 
         logger.info(f"Job {job_id} completed")
@@ -190,32 +280,37 @@ class JobQueueService:
         """Mark job as failed."""
         r = await self._get_redis()
         pipe = r.pipeline()
-        pipe.hset(self._key("job", job_id), mapping={
+        pipe.hset(self._job_key(job_id), mapping={
             "status": "failed",
             "error": error,
             "currentStep": "Blad",
             "updatedAt": datetime.now(timezone.utc).isoformat(),
         })
-        pipe.srem(self._key("active_jobs"), job_id)
+        pipe.srem(_ACTIVE_JOBS_KEY, job_id)
         await pipe.execute()
         logger.error(f"Job {job_id} failed: {error}")
 
     async def get_result(self, job_id: str) -> dict | None:
         """Get completed job result."""
         r = await self._get_redis()
-        raw = await r.get(self._key("job", job_id, "result"))
+        raw = await r.get(self._result_key(job_id))
         if raw is None:
             return None
-        return json.loads(raw)
+        return orjson.loads(raw)
+
+    async def get_result_raw(self, job_id: str) -> bytes | None:
+        """Get completed job result as stored JSON bytes (no decode)."""
+        r = await self._get_redis()
+        return await r.get(self._result_key(job_id))
 
     async def update_result(self, job_id: str, result: dict) -> None:
         """Update job result in Redis (for merge/split/rename/reclassify operations)."""
         r = await self._get_redis()
         await r.set(
-            self._key("job", job_id, "result"),
-            json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"),
+            self._result_key(job_id),
+            _dumps(result),
+            ex=RESULT_TTL,
         )
-        await r.expire(self._key("job", job_id, "result"), RESULT_TTL)
         logger.info(f"Job {job_id} result updated")
 
     # ---- Undo stack (max 20 entries per job) ----
@@ -224,53 +319,66 @@ class JobQueueService:
 
     async def push_undo(self, job_id: str, result: dict) -> None:
         """Save current result to undo stack (call before merge/split/reclassify/rename)."""
+        await self.push_undo_raw(job_id, _dumps(result))
+
+    async def checkpoint_result(self, job_id: str) -> bool:
+        """Push the stored result onto the undo stack as-is (no decode/encode). False if no result."""
+        raw = await self.get_result_raw(job_id)
+        if raw is None:
+            return False
+        await self.push_undo_raw(job_id, raw)
+        return True
+
+    async def push_undo_raw(self, job_id: str, payload: bytes) -> None:
+        """Save an already serialized result to the undo stack."""
         r = await self._get_redis()
-        key = self._key("job", job_id, "undo")
-        payload = json.dumps(result, ensure_ascii=False, default=str).encode("utf-8")
-        await r.lpush(key, payload)
-        await r.ltrim(key, 0, self.UNDO_STACK_MAX - 1)
-        await r.expire(key, RESULT_TTL)
+        key = self._undo_key(job_id)
+        pipe = r.pipeline(transaction=False)
+        pipe.lpush(key, payload)
+        pipe.ltrim(key, 0, self.UNDO_STACK_MAX - 1)
+        pipe.expire(key, RESULT_TTL)
+        await pipe.execute()
         logger.info(f"Job {job_id} undo checkpoint saved")
 
     async def pop_undo(self, job_id: str) -> dict | None:
         """Restore previous result from undo stack. Returns restored result or None."""
+        raw = await self.pop_undo_raw(job_id)
+        return orjson.loads(raw) if raw is not None else None
+
+    async def pop_undo_raw(self, job_id: str) -> bytes | None:
+        """Jak pop_undo, ale zwraca zapisany JSON (bytes) - przywrocenie bez parsowania."""
         r = await self._get_redis()
-        key = self._key("job", job_id, "undo")
-        raw = await r.lpop(key)
+        raw = await r.lpop(self._undo_key(job_id))
         if raw is None:
             return None
-        prev = json.loads(raw.decode("utf-8"))
-        await self.update_result(job_id, prev)
+        await r.set(self._result_key(job_id), raw, ex=RESULT_TTL)
         logger.info(f"Job {job_id} undone, result restored")
-        return prev
+        return raw
 
     async def get_texts(self, job_id: str) -> list[str] | None:
         """Get stored texts for a job."""
         r = await self._get_redis()
-        raw = await r.get(self._key("texts", job_id))
+        raw = await r.get(self._texts_key(job_id))
         if raw is None:
             return None
-        return json.loads(raw)
+        return orjson.loads(raw)
 
     async def delete_job(self, job_id: str) -> bool:
         """Delete a job and all associated data (texts, embeddings, result)."""
         r = await self._get_redis()
-        
-        # Check if job exists
-        exists = await r.exists(self._key("job", job_id))
-        if not exists:
-            return False
-        
-        # Delete all job-related keys
+
+        # Jeden round-trip: wynik DEL hasha joba mowi, czy job istnial (bez osobnego EXISTS)
         pipe = r.pipeline()
-        pipe.delete(self._key("job", job_id))
-        pipe.delete(self._key("job", job_id, "result"))
-        pipe.delete(self._key("job", job_id, "undo"))
-        pipe.delete(self._key("texts", job_id))
-        pipe.delete(self._key("embeddings", job_id))
-        pipe.srem(self._key("active_jobs"), job_id)
-        await pipe.execute()
-        
+        pipe.delete(self._job_key(job_id))
+        pipe.delete(self._result_key(job_id))
+        pipe.delete(self._undo_key(job_id))
+        pipe.delete(self._texts_key(job_id))
+        pipe.delete(self._embeddings_key(job_id))
+        pipe.srem(_ACTIVE_JOBS_KEY, job_id)
+        job_deleted, *_ = await pipe.execute()
+        if not job_deleted:
+            return False
+
         logger.info(f"Job {job_id} deleted")
         return True
 
@@ -283,10 +391,8 @@ class JobQueueService:
         np.save(buf, embeddings)
         buf.seek(0)
 
-        pipe = r.pipeline()
-        pipe.set(self._key("embeddings", job_id), buf.read())
-        pipe.expire(self._key("embeddings", job_id), EMBEDDING_CACHE_TTL)
-        await pipe.execute()
+        key = self._embeddings_key(job_id)
+        await r.set(key, buf.read(), ex=EMBEDDING_CACHE_TTL)
 
         size_mb = embeddings.nbytes / (1024 * 1024)
         logger.info(
@@ -297,7 +403,7 @@ class JobQueueService:
     async def get_cached_embeddings(self, job_id: str) -> np.ndarray | None:
         """Retrieve cached embeddings from Redis."""
         r = await self._get_redis()
-        raw = await r.get(self._key("embeddings", job_id))
+        raw = await r.get(self._embeddings_key(job_id))
         if raw is None:
             return None
 
@@ -309,7 +415,38 @@ class JobQueueService:
     async def has_cached_embeddings(self, job_id: str) -> bool:
         """Check if embeddings exist in cache."""
         r = await self._get_redis()
-        return bool(await r.exists(self._key("embeddings", job_id)))
+        return bool(await r.exists(self._embeddings_key(job_id)))
+
+    # ---- Label / keyword cache (content-addressed, wspolny dla wszystkich jobow) ----
+
+    async def _get_many_json(self, keys: list[str]) -> list:
+        if not keys:
+            return []
+        r = await self._get_redis()
+        return [orjson.loads(raw) if raw is not None else None for raw in await r.mget(keys)]
+
+    async def _set_many_json(self, entries: dict[str, object], ttl: int) -> None:
+        if not entries:
+            return
+        r = await self._get_redis()
+        pipe = r.pipeline(transaction=False)
+        for key, value in entries.items():
+            pipe.set(key, _dumps(value), ex=ttl)
+        await pipe.execute()
+
+    async def get_cached_labels(self, digests: list[str]) -> list[dict | None]:
+        """Etykiety LLM dla digestow tresci klastrow (None = brak w cache)."""
+        return await self._get_many_json([self._label_key(d) for d in digests])
+
+    async def cache_labels(self, labels: dict[str, dict]) -> None:
+        await self._set_many_json({self._label_key(d): v for d, v in labels.items()}, LLM_LABEL_CACHE_TTL)
+
+    async def get_cached_keywords(self, digests: list[str]) -> list[list[str] | None]:
+        """Slowa kluczowe dla digestow tekstow klastrow (None = brak w cache)."""
+        return await self._get_many_json([self._keywords_key(d) for d in digests])
+
+    async def cache_keywords(self, keywords: dict[str, list[str]]) -> None:
+        await self._set_many_json({self._keywords_key(d): v for d, v in keywords.items()}, LLM_LABEL_CACHE_TTL)
 
     # ---- List all known jobs ----
 
@@ -319,7 +456,7 @@ class JobQueueService:
         results = []
 
         # Active jobs
-        active_ids = await r.smembers(self._key("active_jobs"))
+        active_ids = await r.smembers(_ACTIVE_JOBS_KEY)
         seen = set()
         for raw_id in active_ids:
             job_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
@@ -364,7 +501,7 @@ class JobQueueService:
         try:
             r = await self._get_redis()
             await r.ping()
-            active = await r.scard(self._key("active_jobs"))
+            active = await r.scard(_ACTIVE_JOBS_KEY)
             return {
                 "status": "up",
                 "activeJobs": int(active) if active else 0,
@@ -377,3 +514,6 @@ class JobQueueService:
         if self._redis:
             await self._redis.close()
             self._redis = None
+        if self._pool:
+            await self._pool.disconnect()
+            self._pool = None
@@ -7,11 +7,13 @@ Używa instructor do structured outputs z modelami Pydantic.
 from __future__ import annotations
 
 import asyncio
+import importlib.util
 import logging
 import time
 
+import httpx
 import instructor
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 from config import (
     OPENAI_API_KEY,
@@ -20,8 +22,11 @@ from config import (
     LLM_TEMPERATURE,
     LLM_MAX_TOKENS,
     LLM_RETRY_COUNT,
+    LLM_MAX_CONCURRENCY,
+    LLM_LABEL_BATCH_SIZE,
 )
 from schemas import (
+    BatchClusterLabelResponse,
     ClusterLabelResponse,
     RefinementSuggestionsResponse,
     LLMSuggestion,
@@ -30,6 +35,14 @@ from schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Wspolny limit rownoleglych zapytan do API (wszystkie instancje LLMService w procesie)
+_LLM_SEMAPHORE = asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY))
+
+# HTTP/2 (multipleksowanie zapytan na jednym polaczeniu) tylko gdy zainstalowany h2
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
 # ===== Prompty =====
 
 LABELING_SYSTEM_PROMPT = """\
@@ -42,17 +55,32 @@ Dla każdej grupy musisz:
 4. Odpowiedz WYŁĄCZNIE poprawnym JSON-em, bez dodatkowego tekstu\
 """
 
-LABELING_USER_PROMPT = """\
+LABELING_CLUSTER_BLOCK = """\
 Klaster {cluster_id} ({doc_count} dokumentów, koherencja: {coherence}%):
 
 Reprezentatywne teksty:
 {samples}
 
-Słowa kluczowe TF-IDF: {keywords}
+Słowa kluczowe TF-IDF: {keywords}\
+"""
+
+LABELING_USER_PROMPT = (
+    LABELING_CLUSTER_BLOCK
+    + """
 
 Podaj etykietę i opis w formacie JSON:
 {{"label": "...", "description": "..."}}\
 """
+)
+
+LABELING_BATCH_USER_PROMPT = """\
+Poniżej {num_clusters} klastrów. Dla KAŻDEGO podaj etykietę i opis.
+
+{clusters}
+
+Zwróć listę "labels" z jednym wpisem na klaster:
+{{"cluster_id": <ID klastra>, "label": "...", "description": "..."}}\
+"""
 
 REFINEMENT_SYSTEM_PROMPT = """\
 Jesteś ekspertem od optymalizacji kategoryzacji tekstu.
@@ -113,6 +141,8 @@ class LLMService:
     Używa structured outputs z modelami Pydantic.
     """
 
+    _instance: LLMService | None = None
+
     def __init__(self) -> None:
         self.client: AsyncOpenAI | None = None
         self.instructor_client: instructor.Instructor | None = None
@@ -121,17 +151,39 @@ class LLMService:
         self.max_tokens = LLM_MAX_TOKENS
         self.retry_count = LLM_RETRY_COUNT
 
+    @classmethod
+    def get_instance(cls) -> LLMService:
+        # Jeden klient AsyncOpenAI (pula polaczen HTTP) na proces
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
     def _ensure_client(self) -> None:
         if self.client is None:
             if not OPENAI_API_KEY:
                 raise RuntimeError("OPENAI_API_KEY nie jest ustawiony. Ustaw zmienną środowiskową lub dodaj do .env")
-            client_kwargs: dict = {"api_key": OPENAI_API_KEY}
+            client_kwargs: dict = {
+                "api_key": OPENAI_API_KEY,
+                # Jedna pula polaczen keep-alive dla wszystkich wywolan (bez TCP+TLS per zapytanie)
+                "http_client": DefaultAsyncHttpxClient(
+                    http2=_HTTP2_AVAILABLE,
+                    limits=_HTTP_LIMITS,
+                    timeout=_HTTP_TIMEOUT,
+                ),
+            }
             if LLM_BASE_URL:
                 client_kwargs["base_url"] = LLM_BASE_URL
             self.client = AsyncOpenAI(**client_kwargs)
             # Create instructor client for structured outputs
             self.instructor_client = instructor.from_openai(self.client)
 
+    async def close(self) -> None:
+        """Zamyka klienta HTTP (shutdown aplikacji)."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+            self.instructor_client = None
+
     async def _call_llm_structured(
         self,
         response_model: type,
@@ -148,16 +200,17 @@ class LLMService:
 
         for attempt in range(self.retry_count):
             try:
-                response = await self.instructor_client.chat.completions.create(
-                    model=self.model,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    response_model=response_model,
-                )
+                async with _LLM_SEMAPHORE:
+                    response = await self.instructor_client.chat.completions.create(
+                        model=self.model,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt},
+                        ],
+                        response_model=response_model,
+                    )
                 return response
 
             except Exception as e:
@@ -211,7 +264,67 @@ class LLMService:
             return {
                 "label": fallback_label,
                 "description": f"Automatycznie wykryta kategoria ({doc_count} dokumentów)",
+                "fallback": True,
+            }
+
+    async def label_clusters_batch(self, batch: list[dict]) -> list[dict]:
+        """
+        Labeluje kilka klastrów jednym zapytaniem (po LLM_LABEL_BATCH_SIZE na zapytanie).
+        Klastry pominięte w odpowiedzi lub z nieudanych zapytań dostają label_cluster.
+
+        batch: [{"id", "samples", "keywords", "doc_count", "coherence"}, ...]
+
+        Returns:
+            [{"label": "...", "description": "..."}, ...] w kolejności batch
+
+        Raises:
+            NotImplementedError: batch wyłączony (LLM_LABEL_BATCH_SIZE <= 1)
+        """
+        if LLM_LABEL_BATCH_SIZE <= 1:
+            raise NotImplementedError("Batch labeling disabled (LLM_LABEL_BATCH_SIZE <= 1)")
+
+        chunks = [batch[i : i + LLM_LABEL_BATCH_SIZE] for i in range(0, len(batch), LLM_LABEL_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._label_chunk(chunk) for chunk in chunks))
+        return [labeled for chunk_result in results for labeled in chunk_result]
+
+    async def _label_chunk(self, chunk: list[dict]) -> list[dict]:
+        clusters = "\n\n".join(
+            LABELING_CLUSTER_BLOCK.format(
+                cluster_id=item["id"],
+                doc_count=item["doc_count"],
+                coherence=int(item["coherence"] * 100),
+                samples="\n".join(f'{i + 1}. "{text}"' for i, text in enumerate(item["samples"][:8])),
+                keywords=", ".join(item["keywords"][:7]),
+            )
+            for item in chunk
+        )
+        user_prompt = LABELING_BATCH_USER_PROMPT.format(num_clusters=len(chunk), clusters=clusters)
+
+        by_id: dict[int, dict] = {}
+        try:
+            response = await self._call_llm_structured(
+                BatchClusterLabelResponse,
+                LABELING_SYSTEM_PROMPT,
+                user_prompt,
+            )
+            by_id = {
+                entry.cluster_id: {"label": entry.label, "description": entry.description} for entry in response.labels
             }
+        except Exception as e:
+            logger.error(f"LLM batch labeling failed for clusters {[item['id'] for item in chunk]}: {e}")
+
+        async def _resolve(item: dict) -> dict:
+            if item["id"] in by_id:
+                return by_id[item["id"]]
+            return await self.label_cluster(
+                cluster_id=item["id"],
+                doc_count=item["doc_count"],
+                coherence=item["coherence"],
+                sample_texts=item["samples"],
+                keywords=item["keywords"],
+            )
+
+        return list(await asyncio.gather(*(_resolve(item) for item in chunk)))
 
     async def label_all_clusters(
         self,
@@ -9,6 +9,8 @@ import asyncio
 import logging
 import time
 from datetime import datetime, timezone
+from itertools import chain, islice
+from operator import itemgetter
 
 import numpy as np
 from sklearn.cluster import KMeans
@@ -21,6 +23,8 @@ from config import CLUSTER_COLORS
 
 logger = logging.getLogger(__name__)
 
+_TOPIC_ID = itemgetter("id")
+
 
 class PipelineService:
     """
@@ -28,12 +32,20 @@ class PipelineService:
     With Redis job queue for async processing and embedding cache.
     """
 
+    _instance: PipelineService | None = None
+
     def __init__(self) -> None:
         self.encoder = EncoderService.get_instance()
-        self.clustering = ClusteringService()
-        self.llm = LLMService()
+        self.clustering = ClusteringService.get_instance()
+        self.llm = LLMService.get_instance()
         self.jobs = JobQueueService.get_instance()
 
+    @classmethod
+    def get_instance(cls) -> PipelineService:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
     async def _encode_with_progress(self, job_id: str, texts: list[str], config: dict) -> np.ndarray:
         """
         Encode texts in executor with progress updates.
@@ -186,8 +198,6 @@ class PipelineService:
                 embeddings = await self._encode_with_progress(job_id, texts, config)
                 await self.jobs.cache_embeddings(job_id, embeddings)
 
-            await self.jobs.update_job(job_id, progress=35)
-
             # === Step 2: BERTopic (UMAP + clustering) + 2D for viz ===
             await self.jobs.update_job(
                 job_id,
@@ -213,8 +223,6 @@ class PipelineService:
                 lambda: self.clustering.reduce_to_2d(embeddings, seed=seed)
             )
 
-            await self.jobs.update_job(job_id, progress=60)
-
             # === Step 3: Coherence + topics (keywords/samples from BERTopic) ===
             await self.jobs.update_job(
                 job_id, progress=70, current_step="Obliczanie koherencji i budowanie topikow..."
@@ -256,7 +264,7 @@ class PipelineService:
                     "coherenceScore": 0,
                     "keywords": [],
                 })
-                topics = sorted(topics, key=lambda t: t["id"])
+                topics = sorted(topics, key=_TOPIC_ID)
 
             refinement = await self.llm.generate_refinement_suggestions(
                 topics=topics,
@@ -332,25 +340,31 @@ class PipelineService:
 
         target_id = min(cluster_ids)
         merge_set = set(cluster_ids)
+        # Jeden przebieg po dokumentach: przepisanie clusterId, suma wspolrzednych scalonych, szum
+        # (target_id nalezy do merge_set, wiec scalone dokumenty = dokumenty z merge_set)
         affected = 0
+        noise = 0
+        sx = sy = 0.0
         for doc in documents:
-            if doc.get("clusterId") in merge_set:
+            cid = doc.get("clusterId")
+            if cid in merge_set:
                 doc["clusterId"] = target_id
                 affected += 1
+                sx += doc["x"]
+                sy += doc["y"]
+            elif cid == -1:
+                noise += 1
 
-        merged_topics = [t for t in topics if t["id"] in merge_set]
-        remaining = [t for t in topics if t["id"] not in merge_set]
-        merged_docs = [d for d in documents if d.get("clusterId") == target_id]
+        merged_topics = []
+        remaining = []
+        for t in topics:
+            (merged_topics if t["id"] in merge_set else remaining).append(t)
 
-        cx = sum(d["x"] for d in merged_docs) / len(merged_docs) if merged_docs else 50
-        cy = sum(d["y"] for d in merged_docs) / len(merged_docs) if merged_docs else 50
+        cx = sx / affected if affected else 50
+        cy = sy / affected if affected else 50
 
-        all_kw = []
-        for t in merged_topics:
-            all_kw.extend(t.get("keywords", []))
-        all_samples = []
-        for t in merged_topics:
-            all_samples.extend(t.get("sampleTexts", []))
+        all_kw = list(chain.from_iterable(t.get("keywords", []) for t in merged_topics))
+        all_samples = list(islice(chain.from_iterable(t.get("sampleTexts", []) for t in merged_topics), 5))
 
         total = sum(t.get("documentCount", 0) for t in merged_topics)
         wc = sum(t.get("coherenceScore", 0.5) * t.get("documentCount", 0) for t in merged_topics)
@@ -360,16 +374,15 @@ class PipelineService:
             "id": target_id,
             "label": new_label,
             "description": f"Polaczenie klastrow {cluster_ids}",
-            "documentCount": len(merged_docs),
-            "sampleTexts": all_samples[:5],
+            "documentCount": affected,
+            "sampleTexts": all_samples,
             "color": CLUSTER_COLORS[target_id % len(CLUSTER_COLORS)],
             "centroidX": round(cx, 2),
             "centroidY": round(cy, 2),
             "coherenceScore": round(coh, 3),
             "keywords": list(dict.fromkeys(all_kw))[:7],
         }
-        final = sorted(remaining + [new_topic], key=lambda t: t["id"])
-        noise = sum(1 for d in documents if d.get("clusterId") == -1)
+        final = sorted(remaining + [new_topic], key=_TOPIC_ID)
 
         result = {
             "documents": documents,
@@ -417,13 +430,23 @@ class PipelineService:
         if len(docs_to_reclassify) < num_clusters * 3:
             raise ValueError(f"Za mało dokumentów ({len(docs_to_reclassify)}) dla {num_clusters} klastrów")
 
+        # Embeddingi i teksty joba pobierane raz - uzywane przez KMeans, koherencje, 2D i etykiety
+        all_embeddings = None
+        texts = None
+        if job_id:
+            try:
+                # Oba odczyty z Redis rownolegle - czas = max, nie suma
+                all_embeddings, texts = await asyncio.gather(
+                    self.jobs.get_cached_embeddings(job_id),
+                    self.jobs.get_texts(job_id),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load cached embeddings/texts for reclassify: {e}")
+
         # Get embeddings and run KMeans
         new_labels = None
         if job_id:
             try:
-                all_embeddings = await self.jobs.get_cached_embeddings(job_id)
-                texts = await self.jobs.get_texts(job_id)
-
                 if all_embeddings is not None and texts is not None:
                     # Map document IDs to indices
                     doc_id_to_idx = {doc["id"]: i for i, doc in enumerate(documents)}
@@ -434,9 +457,10 @@ class PipelineService:
                     # Get embeddings for documents to reclassify
                     reclassify_embeddings = all_embeddings[reclassify_indices]
 
-                    # Run KMeans on embeddings
-                    kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-                    new_labels = await asyncio.to_thread(kmeans.fit_predict, reclassify_embeddings)
+                    # Run KMeans on embeddings (faiss gdy dostepny)
+                    new_labels, _ = await asyncio.to_thread(
+                        self.clustering.fit_kmeans, reclassify_embeddings, num_clusters
+                    )
             except Exception as e:
                 logger.warning(f"Failed to use embeddings for reclassify, using 2D coords: {e}")
 
@@ -450,9 +474,12 @@ class PipelineService:
         max_id = max(t["id"] for t in topics) if topics else 0
         new_ids = [max_id + 1 + i for i in range(num_clusters)]
 
-        # Assign documents to new clusters
+        # Assign documents to new clusters (i od razu grupuj je per nowy klaster)
+        docs_by_new_id: dict[int, list[dict]] = {new_id: [] for new_id in new_ids}
         for doc, label in zip(docs_to_reclassify, new_labels):
-            doc["clusterId"] = new_ids[label]
+            new_id = new_ids[label]
+            doc["clusterId"] = new_id
+            docs_by_new_id[new_id].append(doc)
 
         # Remove old topics
         remaining_topics = [t for t in topics if t["id"] not in from_set]
@@ -461,7 +488,6 @@ class PipelineService:
         coherence_scores: dict[int, float] = {}
         if job_id:
             try:
-                all_embeddings = await self.jobs.get_cached_embeddings(job_id)
                 if all_embeddings is not None and len(all_embeddings) > 0:
                     # Build labels array in job/embedding order (backend uses id "doc-{i}" for i-th doc)
                     doc_id_to_cluster = {d["id"]: d["clusterId"] for d in documents}
@@ -479,10 +505,10 @@ class PipelineService:
         # Recalculate 2D coordinates if we have embeddings
         if job_id:
             try:
-                all_embeddings = await self.jobs.get_cached_embeddings(job_id)
                 if all_embeddings is not None:
                     # Recalculate 2D coords for all documents
-                    coords_2d = await asyncio.to_thread(self.clustering.reduce_to_2d, all_embeddings, 42)
+                    # Embeddingi joba sa niezmienne - kolejne reclassify tego joba biora 2D z cache
+                    coords_2d = await asyncio.to_thread(self.clustering.reduce_to_2d, all_embeddings, 42, job_id)
                     # Normalize coords
                     x_min, x_max = coords_2d[:, 0].min(), coords_2d[:, 0].max()
                     y_min, y_max = coords_2d[:, 1].min(), coords_2d[:, 1].max()
@@ -525,14 +551,11 @@ class PipelineService:
         use_llm_success = False
         if job_id and generate_labels:
             try:
-                texts = await self.jobs.get_texts(job_id)
-                all_embeddings = await self.jobs.get_cached_embeddings(job_id)
-
                 if texts is not None and all_embeddings is not None:
                     doc_id_to_idx = {doc["id"]: i for i, doc in enumerate(documents)}
 
                     for i, new_id in enumerate(new_ids):
-                        cluster_docs = [d for d in docs_to_reclassify if d.get("clusterId") == new_id]
+                        cluster_docs = docs_by_new_id[new_id]
                         if not cluster_docs:
                             continue
 
@@ -592,18 +615,18 @@ class PipelineService:
             except Exception as e:
                 logger.warning(f"Failed to use LLM for labeling new topics: {e}")
                 for i, new_id in enumerate(new_ids):
-                    cluster_docs = [d for d in docs_to_reclassify if d.get("clusterId") == new_id]
+                    cluster_docs = docs_by_new_id[new_id]
                     if not cluster_docs:
                         continue
                     new_topics.append(make_default_topic(i, new_id, cluster_docs))
         else:
             for i, new_id in enumerate(new_ids):
-                cluster_docs = [d for d in docs_to_reclassify if d.get("clusterId") == new_id]
+                cluster_docs = docs_by_new_id[new_id]
                 if not cluster_docs:
                     continue
                 new_topics.append(make_default_topic(i, new_id, cluster_docs))
 
-        final_topics = sorted(remaining_topics + new_topics, key=lambda t: t["id"])
+        final_topics = sorted(remaining_topics + new_topics, key=_TOPIC_ID)
         noise = sum(1 for d in all_documents if d.get("clusterId") == -1)
 
         result = {
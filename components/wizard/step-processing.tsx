@@ -270,19 +270,24 @@ export function StepProcessing({
         setJobId(id)
         setSubmitted(true)
 
-        const newJob: SavedJob = {
-          jobId: id,
-          name: jobName,
-          status: "queued",
-          progress: 0,
-          textCount: texts.length,
-          topicCount: null,
-          config,
-          createdAt: new Date().toISOString(),
-          updatedAt: new Date().toISOString(),
-          result: null,
+        if (jobInfo.deduplicated && getJob(id)) {
+          // Retry of a job already in storage - keep its name, createdAt and progress
+          updateJobStore(id, { status: jobInfo.status })
+        } else {
+          const newJob: SavedJob = {
+            jobId: id,
+            name: jobName,
+            status: jobInfo.status,
+            progress: 0,
+            textCount: texts.length,
+            topicCount: null,
+            config,
+            createdAt: new Date().toISOString(),
+            updatedAt: new Date().toISOString(),
+            result: null,
+          }
+          saveJob(newJob)
         }
-        saveJob(newJob)
 
         // Poll loop
         while (!signal.aborted) {
@@ -6,6 +6,7 @@ import type {
   LLMSuggestion,
   ClusteringConfig,
   JobInfo,
+  JobStatus,
   SavedJob,
 } from "./clustering-types"
 
@@ -69,7 +70,10 @@ async function apiRequest<T>(url: string, options: RequestInit = {}): Promise<T>
 
 interface SubmitJobResponse {
   jobId: string
-  status: "queued"
+  /** "queued" for a new job; a deduplicated submission returns the in-flight job's current stage */
+  status: JobStatus
+  /** true when identical texts + config reused a job that is still running */
+  deduplicated?: boolean
 }
 
 /**